@@ -6,6 +6,13 @@ November 2024
 
 from typing import List, Dict # Types for List
 from collections import deque # deque allows us to treat an array as a queue
+from collections import OrderedDict # dictionary that remembers (and reorders) insertion order
+from array import array # flat typed buffers, like a C array
+from multiprocessing import Pool, shared_memory # worker processes sharing arrays
+import heapq # C implemented binary heap primitives
+import itertools
+import os
+import tempfile
 import numpy as np
 
 """
@@ -24,48 +31,48 @@ Note:
 """
 
 #P proposers and A acceptors both nxn in length
+def _acceptor_ranks(A, n):
+    """
+    Inverse of the acceptors' lists: rank[a][p] is where p sits in A[a],
+    higher is more preferred. Built one row at a time.
+    """
+    rank = np.empty((n, n), dtype=np.int32)
+    order = np.arange(n, dtype=np.int32)
+    for a in range(n):
+        rank[a, np.asarray(A[a])] = order
+    return rank
+
 def gale_shapely(P: List[int], A: List[int]):
     n = len(P)
+    rank = _acceptor_ranks(A, n)
     matches = [None] * n # index: acceptor, value: proposer
-    engaged = [False] * n # prospers
-    all_matched = False
-    while (not all_matched):
-        all_matched = True
-        # Loop through all proposers i
-        for i in range(n):
-            if engaged[i]:
-                continue
-            all_matched = False
-            # Look at i's next preference
-            # If i's pref isn't engaged they get them 
-            next_pref = P[i][-1]
-            if matches[next_pref] == None:
-                matches[next_pref] = i
-                engaged[i] = True
-                P[i].pop() 
-            # If i's pref is engaged, see if they
-            # prefer i over their current match
-            else:
-                # going from least-to-most
-                for j in range(n-1):
-                    # if I see they see i first, ignore i
-                    if A[next_pref][j] == i:
-                        P[i].pop()
-                        break
-                    # if they see my current match, engage i
-                    elif A[next_pref][j] == matches[next_pref]:
-                        engaged[matches[next_pref]] = False
-                        engaged[i] = True
-                        matches[next_pref] = i
+    proposed = [0] * n # how far down their list each proposer is
+    free = deque(range(n)) # proposers without a match
+    while free:
+        i = free[0]
+        # lists go least-to-most, so i's next choice counts from the end
+        a = int(P[i][n - 1 - proposed[i]])
+        proposed[i] += 1
+        j = matches[a]
+        if j is None:
+            matches[a] = i
+            free.popleft()
+        # a trades up if they rank i above their current match
+        elif rank[a, i] > rank[a, j]:
+            matches[a] = i
+            free.popleft()
+            free.append(j)
+        # otherwise i stays at the front and proposes again
     return matches
 
 """
-Time Complexity: O(n^2). Outer for-loop is O(n), if at least one
-p in P isn't engaged we have to run the for-loop again. Hence, in 
-worst case every p conflicts with each other. but a in A must prefer
-one of them. So we are forced to run n^2 times to resolve n conflicts.
+Time Complexity: O(n^2). Every proposer proposes to each acceptor at
+most once, that's n^2 proposals, and each one is O(1): a lookup in the
+rank matrix instead of a scan of the acceptor's list. Building the
+rank matrix is O(n^2) too.
 
-Space Complexity : O(nxn). Size of the pref lists (counting input).
+Space Complexity : O(nxn). The n x n int32 rank matrix, plus O(n) for
+the matches, pointers and queue. P and A are only read.
 """
 
 # set[i] is name, set[i][...] least to most preferred
@@ -78,6 +85,58 @@ residents: List[int] = [[2,1,0],[0,2,1],[0,1,2],]
 # h0, h1 conflict both wanting r0, but r0 prefers h0
 # print(gale_shapely(hospitals, residents)) # [0,2,1]
         
+"""
+Preference tables on disk:
+At n = 30k, n x n lists of python ints take tens of GB (a list slot and
+a boxed int per entry). On disk a table is just n rows of n ids, raw and
+row-major: int16 while every id fits (n <= 2^15), int32 beyond that. A
+file of 2n^2 bytes can't also be 4m^2 bytes (n/m would be sqrt 2), so
+its size alone tells us n and the type.
+
+np.memmap maps the file instead of reading it: the OS pages in a row
+when we first touch it. gale_shapely only reads a proposer's row as they
+move down it, and reads each acceptor's row once to build the ranks.
+"""
+
+def _preference_dtype(n):
+    return np.int16 if n <= 2**15 else np.int32
+
+def save_preferences(path, prefs):
+    """Write n preference lists (least to most preferred) as a raw table"""
+    n = len(prefs)
+    table = np.memmap(path, dtype=_preference_dtype(n), mode="w+", shape=(n, n))
+    for i in range(n): # one row at a time, prefs may itself be on disk
+        table[i] = prefs[i]
+    table.flush()
+
+def load_preferences(path, dtype=None):
+    """Memory-map a table written by save_preferences, read-only"""
+    size = os.path.getsize(path)
+    for dtype in ((np.int16, np.int32) if dtype is None else (dtype,)):
+        n = int(round((size / np.dtype(dtype).itemsize) ** 0.5))
+        if n * n * np.dtype(dtype).itemsize == size:
+            break
+    else:
+        raise ValueError(f"{path} is not a square preference table.")
+    if n == 0:
+        return np.zeros((0, 0), dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(n, n))
+
+def gale_shapely_files(proposers, acceptors):
+    """gale_shapely straight off two preference files"""
+    return gale_shapely(load_preferences(proposers), load_preferences(acceptors))
+
+"""
+Time complexity: O(n^2), as gale_shapely, plus reading the pages touched.
+
+Space complexity: the n x n int32 rank matrix plus O(n). The tables stay
+on disk, only pages currently in use are held by the OS page cache.
+"""
+
+# save_preferences("residents.pref", residents)
+# save_preferences("hospitals.pref", hospitals)
+# print(gale_shapely_files("residents.pref", "hospitals.pref")) # [0,1,2]
+
 """
 Trees:
 a graph G is a tree if any two statements are true:
@@ -93,6 +152,135 @@ Types of Edges in a graph:
                connections (Does not create cycles).
 """
 
+"""
+Compressed Sparse Row (CSR) Graphs:
+Our dictionary graphs pay for a python list slot, a tuple and two boxed
+ints on every edge. A CSR graph keeps all edges in flat arrays instead:
+- offsets: length n+1, node v's edges live in [offsets[v], offsets[v+1])
+- targets: length m, the node each edge points to
+- weights: length m (optional), the weight of each edge
+
+Example:
+    G = {0: [2,1], 1: [0,3], 2: [0,3]}
+    offsets = [0, 2, 4, 6]
+    targets = [2, 1, 0, 3, 0, 3]
+
+Indexing G[v] gives back the same list the dictionary would, so every
+graph routine below accepts either format.
+"""
+
+class CSRGraph:
+    def __init__(self, offsets, targets, weights=None):
+        """Wrap already built CSR arrays (see from_dict and from_edges)."""
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = np.asarray(targets)
+        self.weights = None if weights is None else np.asarray(weights)
+        self.n = len(self.offsets) - 1
+        self.m = len(self.targets)
+        if self.offsets[-1] != self.m:
+            raise ValueError("offsets[-1] must equal the number of edges.")
+        if self.weights is not None and len(self.weights) != self.m:
+            raise ValueError("weights and targets must be the same length.")
+
+    @staticmethod
+    def _node_dtype(n):
+        """Smallest integer type able to hold a node id."""
+        return np.int32 if n < 2**31 else np.int64
+
+    @classmethod
+    def from_dict(cls, G):
+        """
+        Build from our dictionary format, either G[node] -> [child]
+        or G[node] -> [(weight, child)]. Nodes are 0..n-1.
+        """
+        n = 0
+        weighted = False
+        for v, adj in G.items():
+            n = max(n, v + 1)
+            for c in adj:
+                weighted = isinstance(c, tuple)
+                n = max(n, (c[1] if weighted else c) + 1)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        flat = []
+        for v in range(n):
+            adj = G.get(v, ())
+            offsets[v + 1] = offsets[v] + len(adj)
+            flat.extend(adj)
+        if not weighted:
+            return cls(offsets, np.array(flat, dtype=cls._node_dtype(n)))
+        # (weight, child) pairs -> two columns
+        pairs = np.array(flat).reshape(-1, 2)
+        targets = pairs[:, 1].astype(cls._node_dtype(n))
+        return cls(offsets, targets, pairs[:, 0])
+
+    @classmethod
+    def from_edges(cls, sources, targets, weights=None, n=None):
+        """Build from parallel edge arrays: sources[i] -> targets[i]."""
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets)
+        if n is None:
+            n = int(max(sources.max(initial=-1), targets.max(initial=-1))) + 1
+        # group edges by source, keeping their given order within a node
+        order = np.argsort(sources, kind="stable")
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+        targets = targets[order].astype(cls._node_dtype(n))
+        if weights is not None:
+            weights = np.asarray(weights)[order]
+        return cls(offsets, targets, weights)
+
+    def neighbors(self, v):
+        """Children of v as a list of ints."""
+        a, b = self.offsets[v], self.offsets[v + 1]
+        return self.targets[a:b].tolist()
+
+    def weighted_neighbors(self, v):
+        """Edges of v as a list of (weight, child), like our weighted dicts."""
+        a, b = self.offsets[v], self.offsets[v + 1]
+        return list(zip(self.weights[a:b].tolist(), self.targets[a:b].tolist()))
+
+    def __getitem__(self, v):
+        """G[v], the same adjacency list the dictionary format gives."""
+        if self.weights is None:
+            return self.neighbors(v)
+        return self.weighted_neighbors(v)
+
+    def transpose(self):
+        """The same graph with every edge reversed."""
+        sources = np.repeat(np.arange(self.n), np.diff(self.offsets))
+        return CSRGraph.from_edges(self.targets, sources, self.weights, self.n)
+
+    def frontier_edges(self, frontier):
+        """
+        Every edge leaving the nodes in 'frontier', all at once.
+        Returns (sources, edges): the node each edge leaves from and the
+        edge's index into targets/weights.
+        """
+        frontier = np.asarray(frontier, dtype=np.int64)
+        starts = self.offsets[frontier]
+        counts = self.offsets[frontier + 1] - starts
+        # edge index = start of its node's run + position inside the run
+        run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+        edges = np.repeat(starts, counts) + (np.arange(counts.sum()) - run_starts)
+        return np.repeat(frontier, counts), edges
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return iter(range(self.n))
+
+    def __str__(self):
+        return f"CSRGraph(n={self.n}, m={self.m})"
+
+"""
+Space complexity: O(n+m), but with 4-8 bytes per edge instead of the
+~100 bytes a tuple inside a list costs.
+"""
+
+# C = CSRGraph.from_dict({0: [2,1], 1: [0,3], 2: [0,3]})
+# print(C.offsets, C.targets) # [0 2 4 6] [2 1 0 3 0 3]
+
 """
 Breadth-First Search (BFS)
 
@@ -107,7 +295,7 @@ Properties of graph 'T' produced by BFS:
   eg. s-e-b-n, s-n is the shortest path from s-n, likewise with e-b
 """
 
-# Dictionary of int keys containing a list of integers
+# Dictionary of int keys containing a list of integers (or a CSRGraph)
 def bfs(G: Dict[int, List[int]],s: int):
     q = deque() # queue object to dequeue with 'popleft()'
     q.append(s)
@@ -179,6 +367,85 @@ r"""
      1   5
 """
 
+r"""
+Direction-Optimizing BFS (Beamer):
+Instead of one node at a time, expand a whole level (the frontier) at
+once with array operations. Two ways to find the next level:
+- top-down:  every frontier node looks at its children
+- bottom-up: every unvisited node looks for a parent in the frontier
+Top-down is cheap while the frontier is small. On low-diameter graphs
+the middle levels hold most of the graph, there it's cheaper to ask
+the (few) unvisited nodes instead. We switch when
+    edges out of frontier > edges out of unvisited / alpha  (go bottom-up)
+    frontier size < n / beta                                 (go top-down)
+"""
+
+def frontier_bfs(G, s, alpha=14, beta=24, tree=False, undirected=False):
+    """
+    Level synchronous BFS over a CSRGraph (dictionaries are converted).
+    Returns (level, parent) arrays, -1 where a node is unreached, and the
+    root's parent is also -1. With tree=True the bfs style T dictionary
+    is returned as well. undirected=True skips building the reversed
+    graph since it's the same graph.
+    """
+    if not isinstance(G, CSRGraph):
+        G = CSRGraph.from_dict(G)
+    n = G.n
+    R = G if undirected else None # reversed graph, built when first needed
+    degree = np.diff(G.offsets)
+    level = np.full(n, -1, dtype=np.int64)
+    parent = np.full(n, -1, dtype=np.int64)
+    level[s] = 0
+    frontier = np.array([s], dtype=np.int64)
+    unvisited_edges = G.m - degree[s]
+    bottom_up = False
+    depth = 0
+    while frontier.size:
+        frontier_edges = degree[frontier].sum()
+        if not bottom_up and frontier_edges > unvisited_edges / alpha:
+            bottom_up = True
+        elif bottom_up and frontier.size < n / beta:
+            bottom_up = False
+        depth += 1
+        if bottom_up:
+            if R is None:
+                R = G.transpose()
+            children, edges = R.frontier_edges(np.flatnonzero(level == -1))
+            parents = R.targets[edges]
+            # keep edges whose parent sits in the current frontier
+            hit = level[parents] == depth - 1
+            children, parents = children[hit], parents[hit]
+        else:
+            parents, edges = G.frontier_edges(frontier)
+            children = G.targets[edges]
+            new = level[children] == -1
+            parents, children = parents[new], children[new]
+        # a child can be reached from several parents, keep the first
+        children, first = np.unique(children, return_index=True)
+        level[children] = depth
+        parent[children] = parents[first]
+        unvisited_edges -= degree[children].sum()
+        frontier = children
+    if not tree:
+        return level, parent
+    # T[p] = children of p, keys in the order bfs would visit them
+    reached = np.flatnonzero(level >= 0)
+    reached = reached[np.argsort(level[reached], kind="stable")]
+    T = {v: [] for v in reached.tolist()}
+    for c in reached[1:].tolist():
+        T[int(parent[c])].append(c)
+    return level, parent, T
+
+"""
+Time complexity: O(n+m) work in total, each level is a handful of array
+operations (plus a sort to drop duplicate children), so the python
+overhead is per level instead of per edge.
+
+Space complexity: O(n+m), the reversed graph and the edges of a level.
+"""
+
+# print(frontier_bfs(G,0,tree=True)[2]) # {0: [1, 2], 1: [3], 2: [], 3: [4, 5], 4: [], 5: []}
+
 """
 Depth-First-Search:
 visit each branch fully (does not find longest path)
@@ -187,6 +454,7 @@ Process a node, then put it's children on a stack. Pop an item
 from the stack then process that node. Continue till stack is empty
 """
 
+# G can also be a CSRGraph, G[p] reads the same either way
 def dfs(G: Dict[int,List[int]],s: int):
     n = len(G)
     stack = []
@@ -298,6 +566,7 @@ we should finish processing the final node at the end of our algorithm.
 """
 
 # assuming connected graph and s is the only node with no incoming degrees
+# G is a dictionary or a CSRGraph
 def dfs_top(G: Dict[int,List[int]],s: int):
     n = len(G)
     stack = []
@@ -343,16 +612,16 @@ K = {
     4: []
 }
 # Figure 3.15 does not with the current implementation, 
-# as 1,3,5 are disjoint starting points
-# L = {
-#     1: [2,4],
-#     2: [],
-#     3: [4,7],
-#     4: [],
-#     5: [7,6],
-#     6: [7],
-#     7: []
-# }
+# as 1,3,5 are disjoint starting points (see topological_sort below)
+L = {
+    1: [2,4],
+    2: [],
+    3: [4,7],
+    4: [],
+    5: [7,6],
+    6: [7],
+    7: []
+}
         
 """
 left to right directed graph
@@ -366,6 +635,201 @@ possible valid orderings 0-2-1-3-4 or 0-2-4-1-3
 # print(dfs_top(J,0)) # 0-2-4-1-3
 # print(dfs_top(K,0)) # 0-2-1-3-4
 
+r"""
+Kahn's Algorithm (Topological Sort by in-degree):
+A node can go as soon as everything pointing into it has gone.
+    - count every node's in-degree (incoming edges)
+    - the nodes with in-degree 0 are ready, output them
+    - remove their out-edges, which may bring children down to 0
+    - repeat
+No single source needed, any number of roots works. If nodes are left
+over they all still have an incoming edge from another left over node,
+so walking those edges backwards must run into a cycle.
+
+Levels: the nodes that become ready together don't depend on each other
+(an antichain), so a whole level can be run in parallel.
+    L (Figure 3.15): [1, 3, 5] -> [2, 4, 6] -> [7]
+"""
+
+class CycleError(ValueError):
+    """The graph isn't a DAG, .cycle holds one cycle (as a node list)"""
+    def __init__(self, cycle):
+        super().__init__(f"Graph has a cycle: {cycle}")
+        self.cycle = cycle
+
+def _dag_setup(G):
+    """CSR graph, in-degree array and which node ids actually exist"""
+    if isinstance(G, CSRGraph):
+        present = np.ones(G.n, dtype=bool)
+    else:
+        # dictionaries may skip ids, e.g. L starts at 1
+        keys = list(G)
+        G = CSRGraph.from_dict(G)
+        present = np.zeros(G.n, dtype=bool)
+        present[keys] = True
+        present[G.targets] = True
+    return G, np.bincount(G.targets, minlength=G.n), present
+
+def _find_cycle(G, left):
+    """Walk in-edges among the 'left' over nodes until one repeats"""
+    R = G.transpose()
+    seen = {}
+    v = int(np.flatnonzero(left)[0])
+    while v not in seen:
+        seen[v] = len(seen)
+        v = next(p for p in R.neighbors(v) if left[p])
+    cycle = list(seen)[seen[v]:]
+    cycle.reverse() # we walked it backwards
+    return cycle
+
+def topological_sort(G, levels=False):
+    """
+    Topological order of any DAG (dictionary or CSRGraph) as a list, or
+    with levels=True a list of levels that can each run in parallel.
+    Raises CycleError if G has a cycle.
+    """
+    G, indegree, present = _dag_setup(G)
+    frontier = np.flatnonzero((indegree == 0) & present)
+    order = []
+    while frontier.size:
+        order.append(frontier)
+        _, edges = G.frontier_edges(frontier)
+        children, counts = np.unique(G.targets[edges], return_counts=True)
+        indegree[children] -= counts
+        frontier = children[indegree[children] == 0]
+    if sum(len(f) for f in order) < np.count_nonzero(present):
+        raise CycleError(_find_cycle(G, indegree > 0))
+    if levels:
+        return [f.tolist() for f in order]
+    return np.concatenate(order).tolist() if order else []
+
+def topological_stream(G):
+    """
+    Generator version, yields each node the moment it's ready so work can
+    start before the sort finishes. Raises CycleError at the end if some
+    nodes could never become ready.
+    """
+    G, indegree, present = _dag_setup(G)
+    indeg = indegree.tolist()
+    q = deque(np.flatnonzero((indegree == 0) & present).tolist())
+    left = int(np.count_nonzero(present))
+    while q:
+        p = q.popleft()
+        left -= 1
+        yield p
+        for c in G.neighbors(p):
+            indeg[c] -= 1
+            if indeg[c] == 0:
+                q.append(c)
+    if left:
+        raise CycleError(_find_cycle(G, np.array(indeg) > 0))
+
+"""
+Time complexity: O(n+m), every node is output once and every edge lowers
+one in-degree once. topological_sort does it a level at a time with
+array operations.
+
+Space complexity: O(n+m)
+"""
+
+# print(topological_sort(L)) # [1, 3, 5, 2, 4, 6, 7]
+# print(topological_sort(L, levels=True)) # [[1, 3, 5], [2, 4, 6], [7]]
+# for task in topological_stream(J):
+#     print(task) # 0 2 1 4 3
+# topological_sort({0: [1], 1: [2], 2: [0]}) # CycleError: [1, 2, 0]
+
+r"""
+Strongly Connected Components (SCC):
+u and v are strongly connected if u~>v and v~>u. Shrinking every SCC
+down to one node leaves a DAG (the condensation), see strong_conn.png.
+
+Tarjan's algorithm, one DFS:
+    - index[v]: when the DFS first saw v
+    - low[v]:   smallest index reachable from v's subtree through at
+                most one back edge into nodes still on the stack
+    - when v finishes with low[v] == index[v], v is the root of an SCC,
+      pop the stack down to v, that's the component.
+The recursive version keeps the DFS path on python's call stack and
+hits the recursion limit on long paths. Like dfs, we keep our own
+stack instead, each frame remembers how far through its children it is.
+
+Tarjan finds sink components first, so numbering them backwards gives
+component ids that are already in topological order.
+"""
+
+def strong_components(G):
+    """
+    SCCs of a dictionary or CSRGraph. Returns (comp, C): comp[v] is v's
+    component id, C the condensation DAG {component: [components]},
+    ids in topological order (edges only go to larger ids).
+    """
+    if not isinstance(G, CSRGraph):
+        G = CSRGraph.from_dict(G)
+    n = G.n
+    index = [-1] * n
+    low = [0] * n
+    on_stack = bytearray(n)
+    comp = [-1] * n
+    stack = [] # Tarjan's stack of nodes in unfinished components
+    counter = 0
+    found = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [[root, G.neighbors(root), 0]] # [node, children, next child]
+        while work:
+            frame = work[-1]
+            v, children, i = frame
+            if i < len(children):
+                frame[2] = i + 1
+                c = children[i]
+                if index[c] == -1:
+                    # tree edge, "recurse" into c
+                    index[c] = low[c] = counter
+                    counter += 1
+                    stack.append(c)
+                    on_stack[c] = 1
+                    work.append([c, G.neighbors(c), 0])
+                elif on_stack[c] and index[c] < low[v]:
+                    low[v] = index[c]
+                continue
+            # v is finished, "return" to its parent
+            work.pop()
+            if work and low[v] < low[work[-1][0]]:
+                low[work[-1][0]] = low[v]
+            if low[v] == index[v]:
+                while True:
+                    c = stack.pop()
+                    on_stack[c] = 0
+                    comp[c] = found
+                    if c == v:
+                        break
+                found += 1
+    # sinks were found first, flip so ids follow topological order
+    comp = (found - 1) - np.array(comp, dtype=np.int64)
+    src = comp[np.repeat(np.arange(n), np.diff(G.offsets))]
+    dst = comp[G.targets]
+    between = np.unique(src[src != dst] * found + dst[src != dst])
+    C = {c: [] for c in range(found)}
+    for e in between.tolist():
+        C[e // found].append(e % found)
+    return comp, C
+
+"""
+Time complexity: O(n+m), every node is pushed and popped once and every
+edge looked at once. No recursion, so depth is only limited by memory.
+
+Space complexity: O(n+m)
+"""
+
+# comp, C = strong_components({0: [1], 1: [2], 2: [0,3], 3: [4], 4: [3]})
+# print(comp, C) # [0 0 0 1 1] {0: [1], 1: []}
+# print(topological_sort(C)) # [0, 1]
+
 
 
 """
@@ -402,6 +866,8 @@ Functions:
 - INSERT: Add new element O(log n)
 - EXTRACT: Remove root    O(log n)
 - UPDATE: Update a node   O(log n)
+- DELETE: Remove a node   O(log n)
+UPDATE and DELETE take the node's index in the array (Heap.get() order).
 
 Heap Structure:
         10
@@ -423,10 +889,10 @@ PEEK: return H[0]
 INSERT: 
     - add to the end of the array
     - keep swapping with parent if parent it's smaller
-DELETE: 
-    - add to the end of the array
-    - swap with H[0]
-    - keep swapping with children who are smaller
+DELETE (index i): 
+    - move the last element of the array to i
+    - if it's smaller than what was at i, swap with parents who are larger
+      else, keep swapping with children who are smaller
 EXTRACT:
     - return H[0] and DELETE it in H
 UPDATE:
@@ -440,194 +906,141 @@ n is the number of nodes.
 """
 
 
-class MinHeap:
-    def __init__(self):
-        """Initialize an empty heap."""
-        self.heap = []
-
-    def _parent(self, index):
-        """Get the parent index."""
-        return (index - 1) // 2
-
-    def _left_child(self, index):
-        """Get the left child index."""
-        return 2 * index + 1
-
-    def _right_child(self, index):
-        """Get the right child index."""
-        return 2 * index + 2
-
-    def _swap(self, i,j):
-        # This syntax avoids having to make a temp variable
-        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+class Heap:
+    """
+    Binary heap on top of python's heapq module, whose sift loops run in C.
+    heapq only knows min-heaps of comparable items, so:
+    - key:      order items by key(item) instead of the item itself
+    - max_heap: largest first, done by negating the key (numbers only)
+    With a key (or max_heap) entries are stored as (key, tie, item), the
+    counter 'tie' keeps equal keys first-in-first-out and means items
+    themselves are never compared. Without either, items are stored as-is.
+    """
 
-    def _heapify_up(self, index):
-        """Maintain heap property after insertion."""
-        while index > 0: # Stop if at root
-            parent = self._parent(index)
-            if self.heap[index] < self.heap[parent]:
-                # Swap if current node is smaller than the parent
-                self._swap(index, parent)
-                index = parent
-            else:
-                break
-      
-    def _heapify_down(self, index):
-        """Maintain heap property after deletion."""
-        size = len(self.heap)
-        while True:
-            left = self._left_child(index)
-            right = self._right_child(index)
-            smallest = index # Assume the current node is the smallest
+    def __init__(self, items=None, key=None, max_heap=False):
+        """Initialize a heap, optionally from items in O(n)."""
+        self.heap = []
+        self.key = key
+        self.max_heap = max_heap
+        self._plain = key is None and not max_heap
+        self._tie = itertools.count()
+        if items is not None:
+            self.heapify(items)
+
+    def _entry(self, item):
+        if self._plain:
+            return item
+        k = item if self.key is None else self.key(item)
+        return (-k if self.max_heap else k, next(self._tie), item)
+
+    def _item(self, entry):
+        return entry if self._plain else entry[2]
+
+    def heapify(self, items):
+        """Add many items at once, O(n) bottom-up instead of O(n log n)."""
+        self.heap.extend(map(self._entry, items))
+        heapq.heapify(self.heap)
+
+    def push(self, item):
+        """Insert an item, O(log n)."""
+        heapq.heappush(self.heap, self._entry(item))
+
+    def pop(self):
+        """Remove and return the root (min, or max for a max-heap)."""
+        if not self.heap:
+            raise IndexError("Heap is empty.")
+        return self._item(heapq.heappop(self.heap))
 
-            if left < size and self.heap[left] < self.heap[smallest]: # Compare with left child
-                smallest = left
-            if right < size and self.heap[right] < self.heap[smallest]: # Compare with right child
-                smallest = right
+    def peek(self):
+        """The root without removing it, O(1)."""
+        if not self.heap:
+            raise IndexError("Heap is empty.")
+        return self._item(self.heap[0])
 
-            if smallest != index:
-                # Swap with the smaller child
-                self._swap(index, smallest)
-                index = smallest # repeat with the newly swapped position
-            else:
-                break
+    def pushpop(self, item):
+        """Push then pop in one sift, returns item itself if it'd be the root."""
+        return self._item(heapq.heappushpop(self.heap, self._entry(item)))
 
-    def insert(self, value):
-        """Insert a value into the heap."""
-        self.heap.append(value)  # Add the value to the end
-        self._heapify_up(len(self.heap) - 1)  # Restore heap property
+    def replace(self, item):
+        """Pop then push in one sift, the popped root is returned."""
+        if not self.heap:
+            raise IndexError("Heap is empty.")
+        return self._item(heapq.heapreplace(self.heap, self._entry(item)))
+
+    def _sift(self, index, old):
+        """Restore the heap after heap[index] changed from entry 'old'"""
+        # heapq's own sift loops: _siftdown moves toward the root,
+        # _siftup toward the leaves (named after where the hole goes)
+        if self.heap[index] < old:
+            heapq._siftdown(self.heap, 0, index)
+        else:
+            heapq._siftup(self.heap, index)
 
     def update(self, index, new_value):
-        """Update a value at a given index."""
-        if 0 <= index < len(self.heap):
-            old_value = self.heap[index]
-            self.heap[index] = new_value
-            # If the new value is smaller, heapify up
-            if new_value < old_value:
-                self._heapify_up(index)
-            # If the new value is larger, heapify down
-            else:
-                self._heapify_down(index)
-        else:
+        """Replace the item at array index 'index' (get() order), O(log n)."""
+        if not 0 <= index < len(self.heap):
             raise IndexError("Index out of range.")
+        old = self.heap[index]
+        self.heap[index] = self._entry(new_value)
+        self._sift(index, old)
 
     def delete(self, index):
-        """Delete a value at a given index."""
-        if 0 <= index < len(self.heap):
-            # Swap with the last element and remove it
-            self._swap(index,-1)
-            self.heap.pop()
-            # Restore heap property
-            if index < len(self.heap):
-                self._heapify_down(index)
-        else:
+        """Remove and return the item at array index 'index', O(log n)."""
+        if not 0 <= index < len(self.heap):
             raise IndexError("Index out of range.")
+        old = self.heap[index]
+        last = self.heap.pop() # the last leaf fills the hole
+        if index < len(self.heap):
+            self.heap[index] = last
+            self._sift(index, old)
+        return self._item(old)
 
-    def extract_min(self):
-        """Extract the minimum value (root) from the heap."""
-        if len(self.heap) == 0:
-            raise IndexError("Heap is empty.")
-        min_value = self.heap[0]
-        self.delete(0)
-        return min_value
+    @staticmethod
+    def merge(*streams, key=None, reverse=False):
+        """Lazily merge already sorted streams into one sorted stream."""
+        return heapq.merge(*streams, key=key, reverse=reverse)
 
-    def __str__(self):
-        """String representation of the heap."""
-        return str(self.heap)
+    # the names our older heaps used
+    insert = push
 
-class MaxHeap:
-    def __init__(self):
-        """Initialize an empty heap."""
-        self.heap = []
-
-    def _parent(self, index):
-        """Get the parent index."""
-        return (index - 1) // 2
+    def get(self):
+        """The items in heap (array) order."""
+        return self.heap if self._plain else [e[2] for e in self.heap]
 
-    def _left_child(self, index):
-        """Get the left child index."""
-        return 2 * index + 1
+    def __len__(self):
+        return len(self.heap)
 
-    def _right_child(self, index):
-        """Get the right child index."""
-        return 2 * index + 2
-
-    def _swap(self, i,j):
-        # This syntax avoids having to make a temp variable
-        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+    def __bool__(self):
+        return bool(self.heap)
 
-    def _heapify_up(self, index):
-        """Maintain heap property after insertion."""
-        while index > 0: # Stop if at root
-            parent = self._parent(index)
-            if self.heap[index] > self.heap[parent]:
-                # Swap if current node is greater than the parent
-                self._swap(index, parent)
-                index = parent
-            else:
-                break
-      
-    def _heapify_down(self, index):
-        """Maintain heap property after deletion."""
-        size = len(self.heap)
-        while True:
-            left = self._left_child(index)
-            right = self._right_child(index)
-            largest = index # Assume the current node is the greatest
-
-            if left < size and self.heap[left] > self.heap[largest]: # Compare with left child
-                largest = left
-            if right < size and self.heap[right] > self.heap[largest]: # Compare with right child
-                largest = right
+    def __str__(self):
+        """String representation of the heap."""
+        return str(self.get())
 
-            if largest != index:
-                # Swap with the smaller child
-                self._swap(index, largest)
-                index = largest # repeat with the newly swapped position
-            else:
-                break
+class MinHeap(Heap):
+    def __init__(self, items=None, key=None):
+        super().__init__(items, key)
 
-    def insert(self, value):
-        """Insert a value into the heap."""
-        self.heap.append(value)  # Add the value to the end
-        self._heapify_up(len(self.heap) - 1)  # Restore heap property
+    def extract_min(self):
+        """Extract the minimum value (root) from the heap."""
+        return self.pop()
 
-    def update(self, index, new_value):
-        """Update a value at a given index."""
-        if 0 <= index < len(self.heap):
-            old_value = self.heap[index]
-            self.heap[index] = new_value
-            # If the new value is greater, heapify up
-            if new_value > old_value:
-                self._heapify_up(index)
-            # If the new value is smaller, heapify down
-            else:
-                self._heapify_down(index)
-        else:
-            raise IndexError("Index out of range.")
+class MaxHeap(Heap):
+    def __init__(self, items=None, key=None):
+        super().__init__(items, key, max_heap=True)
 
-    def delete(self, index):
-        """Delete a value at a given index."""
-        if 0 <= index < len(self.heap):
-            # Swap with the last element and remove it
-            self._swap(index,-1)
-            self.heap.pop()
-            # Restore heap property
-            if index < len(self.heap):
-                self._heapify_down(index)
-        else:
-            raise IndexError("Index out of range.")
+    def extract_max(self):
+        """Extract the maximum value (root) from the heap."""
+        return self.pop()
 
-    def extract_min(self):
-        """Extract the minimum value (root) from the heap."""
-        if len(self.heap) == 0:
-            raise IndexError("Heap is empty.")
-        min_value = self.heap[0]
-        self.delete(0)
-        return min_value
+"""
+Time complexity: push/pop/pushpop/replace/update/delete O(log n),
+peek O(1), heapify O(n), merge O(N log k) for N items over k streams.
+"""
 
-    def __str__(self):
-        return str(self.heap)
+# H = MaxHeap([10, 15, 20, 17, 25])
+# print(H.extract_max(), H.peek()) # 25 20
+# print(list(Heap.merge([1,4,9], [2,3,10]))) # [1, 2, 3, 4, 9, 10]
 
 
 """
@@ -650,43 +1063,45 @@ is also an optimal solution.
 Recursively do this for each interval and we achieve an optimal like solution.
 """
 
-def insertion_sort(A):
-    for i in range(1, len(A)):
-        j = i
-        while j >= 1:
-            if A[j] < A[j-1]:
-                A[j],A[j-1] = A[j-1],A[j]
-            else:
-                break
-            j-=1
+"""
+Sorting by key:
+Every sort here is python's own (Timsort, O(n log n), stable) or numpy's
+lexsort, both run in C. What changes between problems is only what we
+sort by:
+- key:      the primary thing to compare, key(item)
+- tiebreak: what decides between equal keys
+Both sorts are stable, so a tie-break is just a sort by the minor key
+followed by a sort by the major one, equal major keys keep the minor
+order from the first pass.
+
+For numpy columns, lexsort takes every key at once. It wants the primary
+key LAST, key_argsort takes them primary first like we'd say it out loud.
+"""
 
-# arr = [2,4,1,10,5,3]
-# print(arr)
-# insertion_sort(arr)
-# print(arr)
+def key_sort(A, key=None, tiebreak=None, reverse=False):
+    """Sort the list A in place by key, ties broken by tiebreak"""
+    if tiebreak is not None:
+        A.sort(key=tiebreak, reverse=reverse)
+    A.sort(key=key, reverse=reverse)
+
+def key_argsort(*keys, reverse=False):
+    """Indices sorting equal-length columns, keys[0] first, then keys[1]..."""
+    keys = [np.asarray(k) for k in reversed(keys)]
+    if reverse: # negate the keys, not the order, so ties stay stable
+        keys = [-k for k in keys]
+    return np.lexsort(keys)
 
 def interval_est_sort(A):
-    """Sorting by earliest start time using insertion sort"""
-    for i in range(1, len(A)):
-        j=i
-        while j >=1:
-            # tuples (start, finish)
-            if A[j][0] < A[j-1][0]:
-                A[j], A[j-1] = A[j-1], A[j]
-            elif A[j][0] == A[j-1][0] and A[j][1] < A[j-1][1]:
-                A[j], A[j-1] = A[j-1], A[j]
-            j-=1
+    """Sort (start, finish, ...) tuples by earliest start, then finish"""
+    key_sort(A, key=lambda t: t[0], tiebreak=lambda t: t[1])
+
 def interval_eft_sort(A):
-    """Sorting by earliest finish using insertion sort"""
-    for i in range(1, len(A)):
-        j=i
-        while j >=1:
-            # tuples (start, finish)
-            if A[j][1] < A[j-1][1]:
-                A[j], A[j-1] = A[j-1], A[j]
-            elif A[j][1] == A[j-1][1] and A[j][0] < A[j-1][0]:
-                A[j], A[j-1] = A[j-1], A[j]
-            j-=1
+    """Sort (start, finish, ...) tuples by earliest finish, then start"""
+    key_sort(A, key=lambda t: t[1], tiebreak=lambda t: t[0])
+
+# arr = [2,4,1,10,5,3]
+# key_sort(arr)
+# print(arr) # [1, 2, 3, 4, 5, 10]
 
 # (start, finish)     
 times = [(4,7),(3,8),(0,6),(8,11),(1,4),(6,10),(5,9),(3,5)]
@@ -694,6 +1109,88 @@ times = [(4,7),(3,8),(0,6),(8,11),(1,4),(6,10),(5,9),(3,5)]
 # print(times)
 # interval_eft_sort(times)
 # print(times)
+# starts, finishes = np.array(times).T
+# print(key_argsort(finishes, starts)) # same order as interval_eft_sort
+
+"""
+External merge sort:
+When the intervals don't fit in memory, we sort them the way MSORT in
+Sections/recurs does, only the bottom of the recursion tree is cut off:
+- Split: cut the file into runs that fit in memory (run_size records)
+- Sort:  each run is sorted on its own, runs go to a process pool
+- Merge: k-way merge of all runs at once with a heap of run heads
+Merging all k runs in one pass instead of pairwise halves means every
+record is read and written twice in total, not log(n) times.
+
+Files are raw row-major records: 'width' numbers of 'dtype' each, e.g.
+(start, finish) int64 pairs written with ndarray.tofile.
+"""
+
+def _sort_run(task):
+    """Sort records [lo, hi) of src by the key columns into its own run file"""
+    src, dtype, width, keys, lo, hi, run = task
+    dtype = np.dtype(dtype)
+    R = np.memmap(src, dtype=dtype, mode="r", shape=(hi - lo, width),
+                  offset=lo * width * dtype.itemsize)
+    R = np.array(R) # one run is what we allow ourselves in memory
+    R[key_argsort(*(R[:, k] for k in keys))].tofile(run)
+    return run
+
+def _read_run(run, dtype, width, block):
+    """Stream the records of a sorted run, 'block' records per read"""
+    R = np.memmap(run, dtype=dtype, mode="r").reshape(-1, width)
+    for lo in range(0, len(R), block):
+        yield from map(tuple, R[lo:lo + block].tolist())
+
+def external_sort(src, dst, width=2, keys=(1, 0), dtype=np.int64,
+                  run_size=2**22, workers=None, tmpdir=None, block=2**16):
+    """
+    Sort the records of file src into file dst, by column keys[0], ties
+    by keys[1] and so on. Defaults sort (start, finish) pairs by EFT.
+    Returns the number of records sorted.
+    """
+    dtype = np.dtype(dtype)
+    n = os.path.getsize(src) // (width * dtype.itemsize)
+    workers = workers or os.cpu_count() or 1
+    if n == 0:
+        open(dst, "wb").close()
+        return 0
+    with tempfile.TemporaryDirectory(dir=tmpdir) as tmp:
+        tasks = [(src, dtype.str, width, tuple(keys), lo, min(lo + run_size, n),
+                  os.path.join(tmp, f"run{j}.dat"))
+                 for j, lo in enumerate(range(0, n, run_size))]
+        if workers == 1 or len(tasks) == 1:
+            runs = [_sort_run(t) for t in tasks]
+        else:
+            with Pool(min(workers, len(tasks))) as pool:
+                runs = pool.map(_sort_run, tasks)
+        # runs are in file order and merge is stable, so the whole sort is too
+        streams = [_read_run(run, dtype, width, block) for run in runs]
+        merged = Heap.merge(*streams, key=lambda r: tuple(r[k] for k in keys))
+        with open(dst, "wb") as out:
+            buffer = []
+            for record in merged:
+                buffer.append(record)
+                if len(buffer) == block:
+                    np.array(buffer, dtype=dtype).tofile(out)
+                    buffer = []
+            if buffer:
+                np.array(buffer, dtype=dtype).tofile(out)
+    return n
+
+"""
+Time complexity: O(n log n) for key_sort and key_argsort. external_sort
+does O(n log r) work per run of r records, split over the workers, and
+O(n log k) to merge k = n/r runs.
+
+Space complexity: O(n) in memory for the in-memory sorts. external_sort
+keeps one run per worker, plus 'block' records per run while merging,
+and O(n) temporary disk for the runs.
+"""
+
+# np.array(times, dtype=np.int64).tofile("times.dat")
+# external_sort("times.dat", "times_eft.dat", run_size=3, workers=2)
+# print(np.fromfile("times_eft.dat", dtype=np.int64).reshape(-1, 2))
 def is_compatible(i,j):
         if i[0] == j[0]:
             return False
@@ -712,8 +1209,7 @@ def interval_schedule(L):
     return sol
 """
 (For this Algorithm)
-Time complexity: O(n^2). Bottle necked by choosing insertion sort for 
-sorting. Would be O(n log n) if merge sort were used. The routine takes 
+Time complexity: O(n log n), bottle necked by the sort. The routine takes
 O(n), if we assumed the array is already sorted by earliest finish time
 
 Space complexity: O(n). We store n tuples and return at most n of them.
@@ -722,6 +1218,57 @@ Space complexity: O(n). We store n tuples and return at most n of them.
 # Figure 4.3
 # print(interval_schedule(times)) #[(1, 4), (4, 7), (8, 11)]
 
+"""
+Interval scheduling on columns:
+For millions of intervals, keep starts and finishes in two numpy arrays
+instead of a list of tuples. Sorting is one lexsort (finish, then start,
+like interval_eft_sort) and the greedy pass is a single scan: take an
+interval if it starts no earlier than the last taken one finishes.
+
+If intervals already arrive in finish order (e.g. read from a sorted
+file), we don't need to hold them at all: decide each one as it comes,
+remembering only the last finish time.
+"""
+
+def interval_schedule_arrays(start, finish):
+    """Indices of the EFT schedule, in finish order"""
+    start, finish = np.asarray(start), np.asarray(finish)
+    order = key_argsort(finish, start)
+    starts, finishes = start[order].tolist(), finish[order].tolist()
+    chosen = []
+    last = -np.inf
+    for i in range(len(starts)):
+        if starts[i] >= last:
+            chosen.append(i)
+            last = finishes[i]
+    return order[chosen]
+
+def interval_schedule_stream(intervals):
+    """
+    Online EFT: yields each accepted (start, finish, ...) interval as it
+    arrives. intervals must come in finish order, O(1) memory.
+    """
+    last = -np.inf
+    previous = -np.inf
+    for interval in intervals:
+        if interval[1] < previous:
+            raise ValueError("Intervals must arrive sorted by finish time.")
+        previous = interval[1]
+        if interval[0] >= last:
+            last = interval[1]
+            yield interval
+
+"""
+Time complexity: O(n log n) for interval_schedule_arrays (the sort),
+O(n) for the stream.
+
+Space complexity: O(n) for the arrays, O(1) for the stream.
+"""
+
+# starts, finishes = np.array(times).T
+# print(interval_schedule_arrays(starts, finishes)) # [4 0 3], i.e. (1,4),(4,7),(8,11)
+# print(list(interval_schedule_stream(sorted(times, key=lambda t: t[1]))))
+
 """
 Interval Partitioning:
 Say you have n classes and k classrooms. You want to find the the best
@@ -735,32 +1282,82 @@ Strategy: Earliest Start Time First [EST]
 - if there's a conflict allocate a new resource
 """
         
+"""
+Instead of asking every resource whether it's free, keep the resources in
+a min-heap keyed by the time they free up. The root is the resource that
+frees up first: if even it is still busy when the next class starts,
+every resource is, so open a new one.
+
+Depth: the most intervals overlapping at any one time. We can never use
+fewer resources than the depth, and EST with the heap uses exactly that
+many. Sweep the timeline, +1 at every start and -1 at every finish
+(finishes first on ties, touching intervals don't overlap), the largest
+running total is the depth.
+
+A zero-length interval (s == s) still needs a resource at s, just not
+for long: its +1 and -1 go between the finishes and the starts at s,
+right next to each other. It then counts against everything running
+through s, and shares a resource with whatever starts at s.
+"""
+
+def interval_depth(start, finish):
+    """Most intervals overlapping at once, the lower bound on resources"""
+    start, finish = np.asarray(start), np.asarray(finish)
+    n = len(start)
+    point = (start == finish).astype(np.int64)
+    times = np.concatenate([finish, start])
+    delta = np.concatenate([-np.ones(n, dtype=np.int64), np.ones(n, dtype=np.int64)])
+    # at one time: finishes (0), zero-length pairs (1), then starts (2)
+    kind = np.concatenate([point, 2 - point])
+    # a zero-length interval's own +1 right before its -1
+    pair = np.concatenate([2 * np.arange(n) + 1, 2 * np.arange(n)]) * np.concatenate([point, point])
+    order = np.lexsort((pair, kind, times))
+    return int(np.cumsum(delta[order]).max(initial=0))
+
+def interval_partition_arrays(start, finish):
+    """
+    EST partitioning on columns. Returns (resource, depth): resource[i]
+    is the id of the resource interval i runs on, depth the number of
+    resources used (which is also the most overlapping at once).
+    """
+    start, finish = np.asarray(start), np.asarray(finish)
+    order = key_argsort(start, finish)
+    starts, finishes = start[order].tolist(), finish[order].tolist()
+    resource = np.empty(len(order), dtype=np.int64)
+    free = Heap() # (time the resource frees up, resource id)
+    opened = 0
+    for j, i in enumerate(order.tolist()):
+        soonest, r = free.peek() if free else (np.inf, None)
+        if soonest <= starts[j]:
+            free.replace((finishes[j], r)) # reuse it, one sift
+        else:
+            r = opened
+            opened += 1
+            free.push((finishes[j], r))
+        resource[i] = r
+    return resource, opened
+
 def interval_partition_schedule(L):
-    interval_est_sort(L)
-    resources = [[]]
-    resources[0].append(L[0])
-    # Go through each class
-    for i in range(1,len(L)):
-        found_space = False
-        # Compatible with any of the present resources?
-        for r in resources:
-            if is_compatible(r[-1], L[i]):
-                r.append(L[i])
-                found_space = True
-                break
-        if not found_space:
-            resources.append([L[i]])
+    """
+    The list of lists view: resources[r] holds the intervals (tuples of L)
+    run on resource r, in start order.
+    """
+    if not L:
+        return []
+    start = np.array([x[0] for x in L])
+    finish = np.array([x[1] for x in L])
+    resource, depth = interval_partition_arrays(start, finish)
+    resources = [[] for _ in range(depth)]
+    for i in key_argsort(start, finish).tolist():
+        resources[resource[i]].append(L[i])
     return resources
 
 """
-Time Complexity: O(n^2). Ignoring our sorting algorithm it's still O(n^2).
-As in the worst case no job is compatible with each other, creating a new
-resource. We iterate n jobs, then we follow the arithmetic sum, as we 
-iterate over each r resource, which will increase by 1 each iteration.
+Time Complexity: O(n log n). The sort, then every interval does one heap
+operation on at most 'depth' resources. interval_depth is one more sort.
 
-Space Complexity: O(n). Input of n items and despite creating some 2D
-structure, we never have to allocate any more space than n in either 
-direction.
+Space Complexity: O(n). The resource array, the heap holds at most one
+entry per resource.
 """
 
 # Figure 4.4
@@ -788,8 +1385,7 @@ you choose to clean your bed or your desk first, does not make a difference, as
 be the same.
 """
 """
-Time complexity: O(n^2), because we chose insertion sort. best is O(n log n)
-with merge-sort.
+Time complexity: O(n log n), the sort.
 
 Space complexity: O(n), the incoming list.
 """
@@ -797,13 +1393,118 @@ Space complexity: O(n), the incoming list.
 # tasks = [(3,14),(2,8),(2,15),(1,9),(4,9),(3,6)]
 # interval_eft_sort(tasks)
 # print(tasks)
+
+"""
+Earliest Deadline First (EDF) scheduling:
+With every task available at time 0 the schedule is just the deadline
+order run back to back, so start/finish times are a cumulative sum:
+    finish[k] = duration[0] + ... + duration[k]   (in deadline order)
+    lateness  = max(0, finish - deadline)
+
+With release times a task can't start before it arrives. Whenever the
+resource frees up, run the released task with the earliest deadline,
+a min-heap keyed by deadline. If nothing has arrived yet, wait for the
+next release. The same loop works online, one task at a time, for
+tasks arriving from a live stream (EDFDispatcher).
+"""
+
+def edf_schedule(duration, deadline, release=None):
+    """
+    Arrays in task order: (start, finish, lateness, max_lateness).
+    Without release times all tasks are ready at time 0.
+    """
+    duration, deadline = np.asarray(duration), np.asarray(deadline)
+    n = len(duration)
+    # times add durations to release times, so they need room for both
+    times = np.result_type(duration, 0) if release is None else \
+        np.result_type(duration, np.asarray(release), 0)
+    start = np.empty(n, dtype=times)
+    finish = np.empty_like(start)
+    if release is None:
+        order = np.argsort(deadline, kind="stable")
+        finish[order] = np.cumsum(duration[order])
+        start = finish - duration
+    else:
+        release = np.asarray(release)
+        arrivals = np.argsort(release, kind="stable").tolist()
+        rel, dur, due = release.tolist(), duration.tolist(), deadline.tolist()
+        ready = Heap() # (deadline, task)
+        t, k = 0, 0
+        while k < n or ready:
+            if not ready:
+                t = max(t, rel[arrivals[k]]) # idle until the next release
+            while k < n and rel[arrivals[k]] <= t:
+                ready.push((due[arrivals[k]], arrivals[k]))
+                k += 1
+            _, i = ready.pop()
+            start[i] = t
+            t += dur[i]
+            finish[i] = t
+    lateness = np.maximum(finish - deadline, 0)
+    return start, finish, lateness, lateness.max(initial=0)
+
+class EDFDispatcher:
+    """
+    Online EDF for one resource: tasks are submitted as they arrive and
+    dispatch() hands out the waiting task with the earliest deadline.
+    Each call is one heap operation.
+    """
+
+    def __init__(self, clock=0):
+        self.ready = Heap() # (deadline, arrival number, task, duration)
+        self.clock = clock  # when the resource is next free
+        self.max_lateness = 0
+        self._arrival = itertools.count() # ties go first-come first-served
+
+    def submit(self, task, duration, deadline):
+        self.ready.push((deadline, next(self._arrival), task, duration))
+
+    def dispatch(self, now=None):
+        """
+        Start the most urgent waiting task at max(now, clock).
+        Returns (task, start, finish, lateness), or None if nothing waits.
+        """
+        if not self.ready:
+            return None
+        deadline, _, task, duration = self.ready.pop()
+        start = self.clock if now is None else max(now, self.clock)
+        self.clock = start + duration
+        lateness = max(0, self.clock - deadline)
+        self.max_lateness = max(self.max_lateness, lateness)
+        return task, start, self.clock, lateness
+
+    def __len__(self):
+        return len(self.ready)
+
+"""
+Time complexity: O(n log n), the sort (or n heap operations with
+release times). O(log k) per submit/dispatch for k waiting tasks.
+
+Space complexity: O(n) offline, O(k) online.
+"""
+
+# tasks = [(3,14),(2,8),(2,15),(1,9),(4,9),(3,6)] # (duration, deadline)
+# duration, deadline = np.array(tasks).T
+# print(edf_schedule(duration, deadline)) # max lateness 1
+# kitchen = EDFDispatcher()
+# kitchen.submit("soup", 3, 6); kitchen.submit("steak", 4, 9)
+# print(kitchen.dispatch(now=0)) # ('soup', 0, 3, 0)
 class TupleMinHeap:
-    def __init__(self):
-        """Initialize an empty heap."""
+    def __init__(self, addressable=False):
+        """
+        Initialize an empty heap. An addressable heap also keeps a
+        node -> index table (the node being value[1]), so a node already
+        in the heap can have its key lowered in place (decrease_key).
+        """
         self.heap = []
+        self.position = {} if addressable else None
 
     def get(self):
         return self.heap
+
+    def __contains__(self, node):
+        """Is the node in the heap? (addressable heaps only)"""
+        return node in self.position
     def _parent(self, index):
         """Get the parent index."""
         return (index - 1) // 2
@@ -819,6 +1520,9 @@ class TupleMinHeap:
     def _swap(self, i,j):
         # This syntax avoids having to make a temp variable
         self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        if self.position is not None:
+            self.position[self.heap[i][1]] = i
+            self.position[self.heap[j][1]] = j
 
     def _heapify_up(self, index):
         """Maintain heap property after insertion."""
@@ -854,8 +1558,13 @@ class TupleMinHeap:
     def insert(self, value):
         """Insert a value into the heap."""
         self.heap.append(value)  # Add the value to the end
+        if self.position is not None:
+            self.position[value[1]] = len(self.heap) - 1
         self._heapify_up(len(self.heap) - 1)  # Restore heap property
 
+    def __len__(self):
+        return len(self.heap)
+
     def update(self, index, new_value):
         """Update a value at a given index."""
         if 0 <= index < len(self.heap):
@@ -874,8 +1583,10 @@ class TupleMinHeap:
         """Delete a value at a given index."""
         if 0 <= index < len(self.heap):
             # Swap with the last element and remove it
-            self._swap(index,-1)
-            self.heap.pop()
+            self._swap(index,len(self.heap) - 1)
+            removed = self.heap.pop()
+            if self.position is not None:
+                del self.position[removed[1]]
             # Restore heap property
             if index < len(self.heap):
                 self._heapify_down(index)
@@ -890,43 +1601,435 @@ class TupleMinHeap:
         self.delete(0)
         return min_value
 
+    def decrease_key(self, node, key):
+        """Lower a node's key, finding it by node id instead of index."""
+        index = self.position[node]
+        if key > self.heap[index][0]:
+            raise ValueError("New key is larger than the current key.")
+        self.update(index, (key, node))
+
+    # same names as Heap, so the graph routines can take either
+    push = insert
+    pop = extract_min
+
     def __str__(self):
         """String representation of the heap."""
         return str(self.heap)
 
-def dijkstra(G,s):
+r"""
+Struct-of-Arrays Heap:
+TupleMinHeap and Heap keep one python tuple per entry, and a tuple lives
+on the heap until it's popped. ArrayHeap keeps the same binary heap but
+splits every entry into columns of flat typed buffers:
+    keys:    float64  [3.0, 5.0, 8.0, ...]
+    data[0]: int64    [  2,   4,   1, ...]   (node, or edge endpoint)
+    data[1]: int64    [  0,   2,   0, ...]   (second endpoint)
+so a stored entry costs 8 bytes per column instead of a tuple plus its
+boxed numbers. That's a memory win, not a speed one: the sifts run in
+python while heapq's run in C, and every key read out of an array is
+boxed again, so per push/pop ArrayHeap is no faster than TupleMinHeap
+and slower than the lazy Heap. pop still hands back a (key, payload...)
+tuple like the other heaps. Use it when the heap is big enough that the
+tuples are the problem.
+
+Entries move as a hole (no swaps); the slot just past the end is used
+as scratch so pop and decrease_key don't copy the entry out into a list.
+heapify sorts the keys with numpy, a sorted array is already a heap.
+"""
+
+class ArrayHeap:
+    def __init__(self, capacity=1024, width=1, n=None):
+        """
+        width: ints stored with every key, 1 for (key, node), 2 for
+               (weight, v, u)
+        n:     number of node ids, makes the heap addressable by data[0]
+               so decrease_key works
+        """
+        capacity = max(capacity, 1)
+        self.size = 0
+        self.keys = array("d", bytes(8 * capacity))
+        self.data = [array("q", bytes(8 * capacity)) for _ in range(width)]
+        self.position = None if n is None else array("q", [-1]) * n
+
+    def _grow(self):
+        chunk = len(self.keys) # doubling
+        self.keys.extend(array("d", bytes(8 * chunk)))
+        for d in self.data:
+            d.extend(array("q", bytes(8 * chunk)))
+
+    def _move(self, src, dst):
+        """Copy entry src into slot dst"""
+        self.keys[dst] = self.keys[src]
+        for d in self.data:
+            d[dst] = d[src]
+        if self.position is not None:
+            self.position[self.data[0][dst]] = dst
+
+    def _sift_up(self, i, key):
+        """Hole at i, move parents down until key fits, returns the slot"""
+        keys = self.keys
+        while i > 0:
+            parent = (i - 1) >> 1
+            if keys[parent] <= key:
+                break
+            self._move(parent, i)
+            i = parent
+        return i
+
+    def _sift_down(self, i, key):
+        keys = self.keys
+        size = self.size
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                return i
+            if child + 1 < size and keys[child + 1] < keys[child]:
+                child += 1
+            if key <= keys[child]:
+                return i
+            self._move(child, i)
+            i = child
+
+    def push(self, entry):
+        """Insert (key, payload...), e.g. (dist, node)"""
+        if self.size == len(self.keys):
+            self._grow()
+        self.size += 1
+        key = entry[0]
+        i = self._sift_up(self.size - 1, key)
+        self.keys[i] = key
+        for j, d in enumerate(self.data, 1):
+            d[i] = entry[j]
+        if self.position is not None:
+            self.position[entry[1]] = i
+
+    def pop(self):
+        """Remove the smallest entry, returned as (key, payload...)"""
+        if not self.size:
+            raise IndexError("Heap is empty.")
+        data = self.data
+        if len(data) == 1:
+            top = (self.keys[0], data[0][0])
+        else:
+            top = (self.keys[0], *[d[0] for d in data])
+        if self.position is not None:
+            self.position[top[1]] = -1
+        self.size -= 1
+        last = self.size
+        if last:
+            # the last entry stays in its slot (now past the end) while
+            # the hole sifts down from the root, then moves in once
+            self._move(last, self._sift_down(0, self.keys[last]))
+        return top
+
+    def decrease_key(self, node, key):
+        """Lower the key of node (data[0]), addressable heaps only"""
+        i = self.position[node]
+        if key > self.keys[i]:
+            raise ValueError("New key is larger than the current key.")
+        if self.size == len(self.keys):
+            self._grow()
+        scratch = self.size # park the entry past the end while it sifts
+        self._move(i, scratch)
+        self.keys[scratch] = key
+        self._move(scratch, self._sift_up(i, key))
+
+    def heapify(self, keys, *columns):
+        """Bulk load from arrays (keys, then one array per payload), O(n log n) in numpy"""
+        keys = np.asarray(keys, dtype=np.float64)
+        order = np.argsort(keys, kind="stable") # sorted, so already a heap
+        self.size = len(keys)
+        self.keys = array("d", keys[order].tobytes() or bytes(8))
+        self.data = [array("q", np.asarray(c, dtype=np.int64)[order].tobytes() or bytes(8))
+                     for c in columns]
+        if self.position is not None and self.size:
+            np.frombuffer(self.position, dtype=np.int64)[
+                np.frombuffer(self.data[0], dtype=np.int64)] = np.arange(self.size)
+
+    def __contains__(self, node):
+        return self.position[node] >= 0
+
+    def __len__(self):
+        return self.size
+
+    def __str__(self):
+        return str([(self.keys[i],) + tuple(d[i] for d in self.data)
+                    for i in range(self.size)])
+
+"""
+Time complexity: push/pop/decrease_key O(log n), heapify O(n log n) but
+all in numpy, growing amortized O(1) per push.
+
+Space complexity: 8 bytes per key and per payload int, versus a 3-tuple
+(~64 bytes) plus boxed numbers per entry.
+"""
+
+r"""
+d-ary and Pairing Heaps:
+A d-ary heap is a binary heap where every node has d children instead
+of 2: children of i are d*i+1 .. d*i+d, parent is (i-1)//d. The tree is
+only log_d(n) tall, so sifting up (insert, decrease-key) is cheaper,
+while sifting down looks at d children per level. Dijkstra does far
+more decrease-keys than extract-mins, so d=4 is a common sweet spot.
+
+A pairing heap is a tree where every node is smaller than its children,
+with no shape rules at all:
+    - meld(a,b): the larger root becomes the first child of the smaller
+    - insert: meld with a one node tree, O(1)
+    - decrease-key: cut the node's subtree out and meld it with the root
+    - extract-min: remove the root and meld its children back in pairs
+      (left to right), then fold the pairs into one (right to left)
+Insert and decrease-key are cheap, extract-min is O(log n) amortized.
+"""
+
+class DaryHeap:
+    def __init__(self, d=4):
+        """Addressable d-ary min-heap of (key, node) tuples."""
+        if d < 2:
+            raise ValueError("d must be at least 2.")
+        self.d = d
+        self.heap = []
+        self.position = {}
+
+    def _sift_up(self, i, entry):
+        """Move parents down into the hole at i until entry fits there"""
+        heap, position, d = self.heap, self.position, self.d
+        while i > 0:
+            parent = (i - 1) // d
+            if heap[parent][0] <= entry[0]:
+                break
+            heap[i] = heap[parent]
+            position[heap[i][1]] = i
+            i = parent
+        heap[i] = entry
+        position[entry[1]] = i
+
+    def _sift_down(self, i, entry):
+        heap, position, d = self.heap, self.position, self.d
+        size = len(heap)
+        while True:
+            first = d * i + 1
+            if first >= size:
+                break
+            # smallest of the (up to) d children
+            child = min(range(first, min(first + d, size)), key=lambda c: heap[c][0])
+            if entry[0] <= heap[child][0]:
+                break
+            heap[i] = heap[child]
+            position[heap[i][1]] = i
+            i = child
+        heap[i] = entry
+        position[entry[1]] = i
+
+    def push(self, entry):
+        self.heap.append(entry)
+        self._sift_up(len(self.heap) - 1, entry)
+
+    def pop(self):
+        if not self.heap:
+            raise IndexError("Heap is empty.")
+        top = self.heap[0]
+        del self.position[top[1]]
+        last = self.heap.pop()
+        if self.heap:
+            self._sift_down(0, last)
+        return top
+
+    def decrease_key(self, node, key):
+        i = self.position[node]
+        if key > self.heap[i][0]:
+            raise ValueError("New key is larger than the current key.")
+        self._sift_up(i, (key, node))
+
+    def __contains__(self, node):
+        return node in self.position
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __str__(self):
+        return str(self.heap)
+
+class _PairingNode:
+    __slots__ = ("key", "node", "child", "next", "prev")
+
+    def __init__(self, key, node):
+        self.key = key
+        self.node = node
+        self.child = None # leftmost child
+        self.next = None  # next sibling
+        self.prev = None  # previous sibling, or the parent for a leftmost child
+
+class PairingHeap:
+    def __init__(self):
+        """Addressable pairing min-heap of (key, node) tuples."""
+        self.root = None
+        self.position = {} # node -> its tree node
+        self.size = 0
+
+    @staticmethod
+    def _meld(a, b):
+        """Hang the larger root under the smaller, returns the new root"""
+        if b.key < a.key:
+            a, b = b, a
+        b.prev = a
+        b.next = a.child
+        if a.child is not None:
+            a.child.prev = b
+        a.child = b
+        return a
+
+    def push(self, entry):
+        x = _PairingNode(entry[0], entry[1])
+        self.position[entry[1]] = x
+        self.root = x if self.root is None else self._meld(self.root, x)
+        self.size += 1
+
+    def pop(self):
+        root = self.root
+        if root is None:
+            raise IndexError("Heap is empty.")
+        del self.position[root.node]
+        self.size -= 1
+        # detach the children
+        children = []
+        c = root.child
+        while c is not None:
+            nxt = c.next
+            c.next = c.prev = None
+            children.append(c)
+            c = nxt
+        # pass 1: meld pairs left to right, pass 2: fold right to left
+        pairs = [self._meld(children[i], children[i + 1]) if i + 1 < len(children)
+                 else children[i] for i in range(0, len(children), 2)]
+        new_root = pairs.pop() if pairs else None
+        while pairs:
+            new_root = self._meld(pairs.pop(), new_root)
+        self.root = new_root
+        return (root.key, root.node)
+
+    def decrease_key(self, node, key):
+        x = self.position[node]
+        if key > x.key:
+            raise ValueError("New key is larger than the current key.")
+        x.key = key
+        if x is self.root:
+            return
+        # cut x's subtree out of its sibling list
+        if x.prev.child is x:
+            x.prev.child = x.next
+        else:
+            x.prev.next = x.next
+        if x.next is not None:
+            x.next.prev = x.prev
+        x.next = x.prev = None
+        self.root = self._meld(self.root, x)
+
+    def __contains__(self, node):
+        return node in self.position
+
+    def __len__(self):
+        return self.size
+
+"""
+Time complexity:
+    d-ary:   push/decrease-key O(log_d n), pop O(d log_d n)
+    pairing: push O(1), decrease-key o(log n), pop O(log n) amortized
+Space complexity: O(n), one entry per queued node.
+"""
+
+def _edge_count(G):
+    return G.m if isinstance(G, CSRGraph) else sum(len(G[v]) for v in G)
+
+def _choose_heap(n, m):
+    """
+    heap="auto", from benchmark_heaps (n = 1000..10000, degree 4..512):
+    the lazy C Heap won almost every row, and the few it lost (pairing
+    or 4-ary at degree 64-256) were within run-to-run noise and flipped
+    back on a rerun. Its O(m) stale entries cost less than the python
+    sifts behind every decrease-key, so there's no density where a
+    decrease-key heap reliably pulls ahead; rerun the benchmark before
+    adding a threshold.
+    """
+    return "lazy"
+
+def _make_heap(heap, n, lazy=False):
+    """
+    The priority queue dijkstra and prims run on:
+    "binary" (TupleMinHeap), "array" (ArrayHeap), "dary" or "<d>-ary"
+    (DaryHeap), "pairing" (PairingHeap), or the lazy Heap.
+    """
+    if lazy or heap == "lazy":
+        return Heap()
+    if heap == "binary":
+        return TupleMinHeap(addressable=True)
+    if heap == "array":
+        return ArrayHeap(capacity=min(n, 1024), n=n)
+    if heap == "dary":
+        return DaryHeap(4)
+    if heap.endswith("-ary") and heap[:-4].isdigit():
+        return DaryHeap(int(heap[:-4]))
+    if heap == "pairing":
+        return PairingHeap()
+    raise ValueError(f"Unknown heap '{heap}'.")
+
+def dijkstra(G,s,lazy=False,heap="binary"):
     """
     Dijkstra's Algorithm:
     find shortest path from node 's' to all other nodes in a graph
+    G[node][(weight,node)], a weighted dictionary or CSRGraph
+
+    lazy=False uses decrease-key, the heap holds at most n entries and
+    every node is settled exactly once. lazy=True pushes a new entry on
+    every improvement instead and skips the stale ones as they're popped,
+    on the C backed Heap.
+    heap: the decrease-key queue, "binary" (TupleMinHeap), "array"
+    (ArrayHeap, compact but no faster), "dary"/"<d>-ary"
+    (DaryHeap), "pairing" (PairingHeap), "lazy" (same as lazy=True) or
+    "auto" to pick one from the graph's density
     """
     n = len(G)
+    if heap == "auto":
+        heap = _choose_heap(n, _edge_count(G))
+    lazy = lazy or heap == "lazy"
     distances = [np.inf] * n # list of shortest paths for each node
     parents = [None] * n     # parent child table
     visited = [False] * n    # check if we've already evaluated a node
-    q = TupleMinHeap()       # minHeap to track next shortest path
-    q.insert((0,s))
+    q = _make_heap(heap, n, lazy) # minHeap to track next shortest path
+    q.push((0,s))
     distances[s] = 0
-    while q.get():
+    while q:
         # pop off heap
-        dist,node = q.extract_min()
+        _,node = q.pop()
+        if visited[node]:
+            continue # stale entry, node was settled with a shorter path
         visited[node] = True
+        dist = distances[node] # (the exact value, ArrayHeap keys are floats)
         # add neighbors which have not been visited
         for c in G[node]:
             # adding total path length to next path
             next = (dist+c[0],c[1])
-            if not visited[c[1]]:
-                q.insert(next)
-                if next[0] < distances[next[1]]:
-                    distances[next[1]] = next[0]
-                    parents[next[1]] = node
+            if visited[c[1]] or next[0] >= distances[next[1]]:
+                continue
+            if lazy or next[1] not in q:
+                q.push(next)
+            else:
+                # one entry per node, lower it in place
+                q.decrease_key(next[1], next[0])
+            distances[next[1]] = next[0]
+            parents[next[1]] = node
     return distances, parents
 
 """
 Time complexity: O(mlog(n)). For 'm' edges and 'n' nodes. Since in our BFS
 approach we visit all edges. For every new edge, we insert into our queue
-which takes log(n) time.
+(or decrease a key) which takes log(n) time.
+
+Space complexity: (n+m). With decrease-key the heap itself is O(n), in
+lazy mode it can grow to O(m) stale entries.
 
-Space complexity: (n+m)
+Heap (lazy) does its sifting in C, TupleMinHeap (decrease-key) in python
+but on a heap of at most n entries.
 """
 
 # G[node][(weight,node)]
@@ -954,7 +2057,473 @@ H = {
 # print(dijkstra(G,0))
 # print(dijkstra(H,0))
 
-def prims(G,s):
+r"""
+Point-to-Point Shortest Paths:
+dijkstra(G,s) settles every node even if we only care about one target 't'.
+
+Bidirectional Dijkstra:
+    Run one search forward from 's' and one backward from 't' (on the
+    reversed graph), always growing the side with the smaller key. Every
+    time a search relaxes an edge into a node the other side has seen,
+    we have a candidate s~v~t path. Once the two heap tops add up to at
+    least the best candidate, nothing shorter can exist and we stop.
+
+A* with landmarks (ALT):
+    Pick a few landmarks 'L' and precompute d(L,v) and d(v,L) for all v.
+    By the triangle inequality
+        d(v,t) >= d(L,t) - d(L,v)   and   d(v,t) >= d(v,L) - d(t,L)
+    the largest of these is a lower bound h(v) on the distance left.
+    Ordering the heap by d(s,v) + h(v) steers the search towards 't'.
+"""
+
+def reverse_graph(G):
+    """Weighted graph with every edge flipped, G[u][(w,v)] -> R[v][(w,u)]"""
+    if isinstance(G, CSRGraph):
+        return G.transpose()
+    R = {v: [] for v in G}
+    for u in G:
+        for w,v in G[u]:
+            R.setdefault(v, []).append((w,u))
+    return R
+
+class Landmarks:
+    def __init__(self, landmarks, to_nodes, from_nodes):
+        """
+        landmarks: the landmark node ids
+        to_nodes[v][i]:   d(landmarks[i], v)
+        from_nodes[v][i]: d(v, landmarks[i])
+        """
+        self.landmarks = np.asarray(landmarks, dtype=np.int64)
+        self.to_nodes = np.asarray(to_nodes, dtype=np.float64)
+        self.from_nodes = np.asarray(from_nodes, dtype=np.float64)
+
+    @classmethod
+    def build(cls, G, k=8, start=0, R=None):
+        """
+        Farthest-point selection: each new landmark is the node farthest
+        (by its closest landmark so far) from the ones already picked.
+        """
+        if R is None:
+            R = reverse_graph(G)
+        n = len(G)
+        landmarks, to_nodes, from_nodes = [], [], []
+        closest = np.array(dijkstra(G, start)[0], dtype=np.float64)
+        for _ in range(min(k, n)):
+            # unreachable nodes can't be bounded by this landmark anyway
+            L = int(np.argmax(np.where(np.isfinite(closest), closest, -1)))
+            if L in landmarks:
+                break
+            landmarks.append(L)
+            to_nodes.append(dijkstra(G, L)[0])
+            from_nodes.append(dijkstra(R, L)[0])
+            d = np.array(to_nodes[-1], dtype=np.float64)
+            # 'start' only seeds the first pick, after that use landmarks
+            closest = d if len(landmarks) == 1 else np.minimum(closest, d)
+        return cls(landmarks, np.transpose(to_nodes), np.transpose(from_nodes))
+
+    def save(self, path):
+        """Store the tables (.npz) so other processes can reuse them."""
+        np.savez(path, landmarks=self.landmarks,
+                 to_nodes=self.to_nodes, from_nodes=self.from_nodes)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(f["landmarks"], f["to_nodes"], f["from_nodes"])
+
+    def bound(self, v, t):
+        """Lower bound on d(v,t), 0 if no landmark knows anything."""
+        with np.errstate(invalid="ignore"): # inf - inf, no information
+            a = self.to_nodes[t] - self.to_nodes[v]
+            b = self.from_nodes[v] - self.from_nodes[t]
+            h = np.fmax.reduce(np.fmax(a, b))
+        return float(h) if h > 0 else 0.0
+
+def _trace_path(parents, v):
+    """Follow a parent table from v back to the root, root first"""
+    path = []
+    while v is not None:
+        path.append(v)
+        v = parents[v]
+    path.reverse()
+    return path
+
+def bidirectional_dijkstra(G, s, t, R=None):
+    """Distance and path from s to t, searching from both ends."""
+    if s == t:
+        return 0, [s]
+    if R is None:
+        R = reverse_graph(G)
+    graphs = (G, R)
+    dist = ({s: 0}, {t: 0})
+    parents = ({s: None}, {t: None})
+    settled = (set(), set())
+    heaps = (TupleMinHeap(addressable=True), TupleMinHeap(addressable=True))
+    heaps[0].insert((0,s))
+    heaps[1].insert((0,t))
+    best, meet = np.inf, None
+    while heaps[0].get() and heaps[1].get():
+        top_f, top_b = heaps[0].get()[0][0], heaps[1].get()[0][0]
+        if top_f + top_b >= best:
+            break
+        side = 0 if top_f <= top_b else 1 # grow the cheaper side
+        other = 1 - side
+        d,u = heaps[side].extract_min()
+        settled[side].add(u)
+        for w,v in graphs[side][u]:
+            if v in settled[side]:
+                continue
+            nd = d + w
+            if nd < dist[side].get(v, np.inf):
+                if v in heaps[side]:
+                    heaps[side].decrease_key(v, nd)
+                else:
+                    heaps[side].insert((nd,v))
+                dist[side][v] = nd
+                parents[side][v] = u
+            # the other search has seen v, s~v~t is a candidate
+            if v in dist[other] and dist[side][v] + dist[other][v] < best:
+                best = dist[side][v] + dist[other][v]
+                meet = v
+    if meet is None:
+        return np.inf, []
+    # s..meet from the forward tree, meet..t from the backward tree
+    path = _trace_path(parents[0], meet)
+    v = parents[1][meet]
+    while v is not None:
+        path.append(v)
+        v = parents[1][v]
+    return best, path
+
+def alt_search(G, s, t, landmarks):
+    """A* from s to t ordered by d(s,v) + landmarks.bound(v,t)."""
+    dist = {s: 0}
+    parents = {s: None}
+    h = {}
+    settled = set()
+    q = TupleMinHeap(addressable=True)
+    q.insert((landmarks.bound(s,t), s))
+    while q.get():
+        _,u = q.extract_min()
+        if u == t:
+            return dist[t], _trace_path(parents, t)
+        settled.add(u)
+        for w,v in G[u]:
+            if v in settled:
+                continue
+            nd = dist[u] + w
+            if nd < dist.get(v, np.inf):
+                if v not in h:
+                    h[v] = landmarks.bound(v,t)
+                if v in q:
+                    q.decrease_key(v, nd + h[v])
+                else:
+                    q.insert((nd + h[v], v))
+                dist[v] = nd
+                parents[v] = u
+    return np.inf, []
+
+def shortest_path(G, s, t, method="bidirectional", landmarks=None, R=None):
+    """
+    Distance and path (list of nodes) from s to t, (inf, []) if t can't
+    be reached.
+    method:
+        "bidirectional": bidirectional dijkstra, R is the reversed graph
+                         (pass it in to reuse it across queries)
+        "alt": A* with a Landmarks object, or the path it was saved to
+        "dijkstra": the full single-source tree, for comparison
+    """
+    if method == "bidirectional":
+        return bidirectional_dijkstra(G, s, t, R)
+    if method == "alt":
+        if landmarks is None:
+            raise ValueError("method='alt' needs landmarks.")
+        if isinstance(landmarks, str):
+            landmarks = Landmarks.load(landmarks)
+        return alt_search(G, s, t, landmarks)
+    if method == "dijkstra":
+        distances, parents = dijkstra(G, s)
+        if distances[t] == np.inf:
+            return np.inf, []
+        return distances[t], _trace_path(parents, t)
+    raise ValueError(f"Unknown method '{method}'.")
+
+"""
+Time complexity: O(m log n) in the worst case for all three, the same as
+dijkstra. In practice both bidirectional and ALT settle a small ball
+around s and t instead of the whole graph. Landmarks.build runs 2k
+dijkstras once per graph.
+
+Space complexity: O(n) per query for the nodes touched, O(kn) for the
+landmark tables.
+"""
+
+# print(shortest_path(G,0,4)) # (5, [0, 2, 4])
+# L = Landmarks.build(G, k=2)
+# L.save("landmarks.npz")
+# print(shortest_path(G,0,3,method="alt",landmarks="landmarks.npz")) # (9, [0, 2, 1, 3])
+
+"""
+Multi-Source Shortest Paths:
+Running dijkstra from thousands of sources is embarrassingly parallel,
+every source is independent. The catch is getting the graph to each
+worker process: pickling it per task costs more than the search. So we
+copy the CSR arrays into shared memory once, and every worker maps the
+same read-only buffers.
+"""
+
+def _share_arrays(arrays):
+    """
+    Copy named arrays into shared memory. Returns the blocks (keep them
+    alive, then close and unlink) and a picklable description for
+    _attach_arrays.
+    """
+    blocks, meta = [], {}
+    for name, a in arrays.items():
+        if a is None:
+            meta[name] = None
+            continue
+        a = np.ascontiguousarray(a)
+        shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+        np.ndarray(a.shape, a.dtype, buffer=shm.buf)[...] = a
+        blocks.append(shm)
+        meta[name] = (shm.name, a.shape, a.dtype.str)
+    return blocks, meta
+
+def _attach_arrays(meta):
+    """Map the arrays described by _share_arrays (inside a worker)"""
+    blocks, arrays = [], {}
+    for name, m in meta.items():
+        if m is None:
+            arrays[name] = None
+            continue
+        shm = shared_memory.SharedMemory(name=m[0])
+        blocks.append(shm)
+        arrays[name] = np.ndarray(m[1], np.dtype(m[2]), buffer=shm.buf)
+    return blocks, arrays
+
+def _release_arrays(blocks):
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+# Per worker process state, set up once by the pool initializer
+_worker = {}
+
+def _init_dijkstra_worker(meta, out, shape):
+    blocks, arrays = _attach_arrays(meta)
+    _worker["blocks"] = blocks # the arrays are only valid while these live
+    _worker["G"] = CSRGraph(arrays["offsets"], arrays["targets"], arrays["weights"])
+    _worker["out"] = None if out is None else \
+        np.memmap(out, dtype=np.float64, mode="r+", shape=shape, order="F")
+
+def _dijkstra_arrays(G, s):
+    """dijkstra, but as (float64 distances, int64 parents with -1 for none)"""
+    distances, parents = dijkstra(G, s)
+    parents = np.array([-1 if p is None else p for p in parents], dtype=np.int64)
+    return np.array(distances, dtype=np.float64), parents
+
+def _dijkstra_task(task):
+    j, s = task
+    distances, parents = _dijkstra_arrays(_worker["G"], s)
+    if _worker["out"] is not None:
+        _worker["out"][:, j] = distances # column j of the shared matrix
+        return j, s, None, None
+    return j, s, distances, parents
+
+def _multi_source_runs(G, sources, workers, out, shape):
+    """Generator behind multi_source_dijkstra, yields (j, s, dist, parents)"""
+    if workers == 1:
+        M = None if out is None else \
+            np.memmap(out, dtype=np.float64, mode="r+", shape=shape, order="F")
+        for j, s in enumerate(sources):
+            distances, parents = _dijkstra_arrays(G, s)
+            if M is not None:
+                M[:, j] = distances
+                distances = parents = None
+            yield j, s, distances, parents
+        if M is not None:
+            M.flush()
+        return
+    blocks, meta = _share_arrays(
+        {"offsets": G.offsets, "targets": G.targets, "weights": G.weights})
+    try:
+        with Pool(workers, _init_dijkstra_worker, (meta, out, shape)) as pool:
+            chunk = max(1, len(sources) // (workers * 8))
+            yield from pool.imap_unordered(_dijkstra_task, enumerate(sources), chunk)
+    finally:
+        _release_arrays(blocks)
+
+def multi_source_dijkstra(G, sources, workers=None, out=None):
+    """
+    dijkstra from every node in 'sources' across 'workers' processes
+    (default: one per core), with the graph in shared memory.
+
+    out=None: returns a generator of (source, distances, parents) numpy
+              arrays, in completion order. parents uses -1 for none.
+    out=path: fills a memory-mapped n x k float64 matrix on disk, column
+              j holding the distances from sources[j], and returns it.
+    """
+    if not isinstance(G, CSRGraph):
+        G = CSRGraph.from_dict(G)
+    sources = [int(s) for s in sources]
+    workers = workers or os.cpu_count() or 1
+    shape = (G.n, len(sources))
+    if out is None:
+        return ((s, d, p) for _, s, d, p in
+                _multi_source_runs(G, sources, workers, None, shape))
+    # column-major so each worker writes one contiguous column
+    np.memmap(out, dtype=np.float64, mode="w+", shape=shape, order="F").flush()
+    for _ in _multi_source_runs(G, sources, workers, out, shape):
+        pass
+    return np.memmap(out, dtype=np.float64, mode="r", shape=shape, order="F")
+
+"""
+Time complexity: O(k m log n / workers) for k sources. Each task only
+sends a source id in and (at most) two arrays back.
+
+Space complexity: one shared copy of the graph, O(n) per worker, plus
+O(nk) for the results (on disk with out=path).
+"""
+
+# for s, distances, parents in multi_source_dijkstra(G, [0,1,2], workers=2):
+#     print(s, distances)
+# M = multi_source_dijkstra(G, range(len(G)), out="all_pairs.dat") # all-pairs
+
+"""
+Shortest-Path-Tree Cache:
+When the same sources are asked for over and over on a graph that rarely
+changes, keep their trees. Least Recently Used (LRU) eviction: an
+OrderedDict keeps trees from oldest to newest use, once we're over the
+memory budget we drop from the old end.
+
+When an edge u->v changes from weight 'old' to 'new', a tree from 's'
+only needs to go if:
+- new < old and d(s,u) + new < d(s,v): the edge now gives a shorter path
+- new > old and u is v's parent: the tree used that edge
+Every other tree is still a valid shortest-path tree.
+"""
+
+class ShortestPathCache:
+    def __init__(self, G, max_bytes=256 * 2**20, algorithm="dijkstra"):
+        """
+        G: weighted graph for dijkstra, unweighted for bfs (frontier_bfs)
+        max_bytes: memory budget for the cached trees
+        """
+        if algorithm not in ("dijkstra", "bfs"):
+            raise ValueError(f"Unknown algorithm '{algorithm}'.")
+        self.G = G
+        self.max_bytes = max_bytes
+        self.algorithm = algorithm
+        self.trees = OrderedDict() # source: (distances, parents)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _compute(self, s):
+        if self.algorithm == "dijkstra":
+            return _dijkstra_arrays(self.G, s)
+        level, parents = frontier_bfs(self.G, s)
+        distances = np.where(level >= 0, level, np.inf)
+        return distances, parents
+
+    def get(self, s):
+        """
+        (distances, parents) from s as read-only numpy arrays, inf for
+        unreachable and -1 for no parent.
+        """
+        if s in self.trees:
+            self.hits += 1
+            self.trees.move_to_end(s)
+            return self.trees[s]
+        self.misses += 1
+        distances, parents = self._compute(s)
+        distances.flags.writeable = False # a caller can't corrupt the cache
+        parents.flags.writeable = False
+        size = distances.nbytes + parents.nbytes
+        if size > self.max_bytes:
+            return distances, parents # doesn't fit at all, don't cache
+        while self.bytes + size > self.max_bytes:
+            self._drop(next(iter(self.trees)))
+            self.evictions += 1
+        self.trees[s] = (distances, parents)
+        self.bytes += size
+        return distances, parents
+
+    def _drop(self, s):
+        distances, parents = self.trees.pop(s)
+        self.bytes -= distances.nbytes + parents.nbytes
+
+    def _set_edge(self, u, v, w):
+        """Change u->v to weight w (None removes it), returns the old weight"""
+        G = self.G
+        if isinstance(G, CSRGraph):
+            a, b = G.offsets[u], G.offsets[u + 1]
+            hit = np.flatnonzero(G.targets[a:b] == v)
+            if not hit.size or w is None:
+                raise ValueError("CSRGraph edges are fixed, only weights can change.")
+            old = G.weights[a + hit[0]].item() if G.weights is not None else 1
+            if G.weights is not None:
+                G.weights[a + hit[0]] = w
+            return old
+        adj = G.setdefault(u, [])
+        weighted = self.algorithm == "dijkstra"
+        for i, c in enumerate(adj):
+            if (c[1] if weighted else c) == v:
+                if w is None:
+                    adj.pop(i)
+                else:
+                    adj[i] = (w,v) if weighted else v
+                return c[0] if weighted else 1
+        if w is not None:
+            adj.append((w,v) if weighted else v)
+        return np.inf
+
+    def update_edge(self, u, v, w):
+        """
+        Set edge u->v to weight w (added if missing, removed if w is None,
+        for bfs any w just means 'present'), and invalidate only the trees
+        the change can affect. Undirected graphs: update both directions.
+        """
+        old = self._set_edge(u, v, w)
+        new = np.inf if w is None else (w if self.algorithm == "dijkstra" else 1)
+        if new == old:
+            return
+        for s in list(self.trees):
+            distances, parents = self.trees[s]
+            if new < old:
+                affected = distances[u] + new < distances[v]
+            else:
+                affected = parents[v] == u
+            if affected:
+                self._drop(s)
+                self.invalidations += 1
+
+    def clear(self):
+        self.trees.clear()
+        self.bytes = 0
+
+    def stats(self):
+        """Counters for sizing the cache."""
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "invalidations": self.invalidations,
+                "trees": len(self.trees), "bytes": self.bytes}
+
+"""
+Time complexity: O(1) for a hit, one dijkstra/bfs for a miss. An edge
+update costs O(1) per cached tree.
+
+Space complexity: at most max_bytes of trees, O(n) each.
+"""
+
+# cache = ShortestPathCache(G, max_bytes=2**20)
+# cache.get(0); cache.get(0)
+# cache.update_edge(2, 4, 1) # shortens 0->2->4, the tree from 0 is dropped
+# print(cache.stats()) # {'hits': 1, 'misses': 1, 'evictions': 0, 'invalidations': 1, ...}
+
+def prims(G,s,lazy=False,heap="binary"):
     """
      Prim's algorithm:
      finds the Minimal Spanning Tree (MST)
@@ -964,25 +2533,35 @@ def prims(G,s):
          pottery, we relax the clay to get a desired shape).
          here we want to find minimum edges so we don't 
          care about keeping track of the accumulated weights
+     G is a weighted dictionary or CSRGraph
+     lazy, heap: same switches as dijkstra
      """
     n = len(G)
+    if heap == "auto":
+        heap = _choose_heap(n, _edge_count(G))
+    lazy = lazy or heap == "lazy"
     distances = [np.inf] * n # list of shortest paths for each node
     parents = [None] * n     # parent child table
     visited = [False] * n    # check if we've already evaluated a node
-    q = TupleMinHeap()       # minHeap to track next shortest path
-    q.insert((0,s))
+    q = _make_heap(heap, n, lazy) # minHeap to track next shortest path
+    q.push((0,s))
     distances[s] = 0
     # (weight, node)
-    while q.get():
-        dist,node = q.extract_min()
+    while q:
+        _,node = q.pop()
+        if visited[node]:
+            continue
         visited[node] = True
         for c in G[node]:
             #in dijkstra's we do (dist+c[0],c[1])  
-            if not visited[c[1]]: 
-                q.insert(c)
-                if c[0] < distances[c[1]]:
-                    distances[c[1]] = c[0]
-                    parents[c[1]] = node
+            if visited[c[1]] or c[0] >= distances[c[1]]:
+                continue
+            if lazy or c[1] not in q:
+                q.push(c)
+            else:
+                q.decrease_key(c[1], c[0])
+            distances[c[1]] = c[0]
+            parents[c[1]] = node
     return parents
 """
 Time complexity: O(m log n), or O((n+m) log n) if disconnected. Logic applies
@@ -1006,6 +2585,45 @@ K = {
 # print(dijkstra(K,0))
 # print(prims(K,0))
 
+# Decrease-key vs lazy insertion on the same graph
+# import timeit
+# print(timeit.timeit(lambda: dijkstra(K,0), number=10000))
+# print(timeit.timeit(lambda: dijkstra(K,0,lazy=True), number=10000))
+
+def benchmark_heaps(sizes=(1000, 10000), degrees=(4, 16, 64),
+                    heaps=("binary", "array", "4-ary", "8-ary", "pairing", "lazy"),
+                    repeat=3, seed=0):
+    """
+    Time dijkstra with every heap on random undirected graphs of n nodes
+    and average degree d, best of 'repeat' runs. Prints a table and
+    returns its rows as dictionaries, each with the winning heap.
+    """
+    import time
+    rng = np.random.default_rng(seed)
+    rows = []
+    for n in sizes:
+        for d in degrees:
+            m = n * d // 2
+            u, v = rng.integers(0, n, m), rng.integers(0, n, m)
+            w = rng.integers(1, 1000, m)
+            C = CSRGraph.from_edges(np.r_[u, v], np.r_[v, u], np.r_[w, w], n=n)
+            row = {"n": n, "degree": d}
+            for heap in heaps:
+                best = np.inf
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    dijkstra(C, 0, heap=heap)
+                    best = min(best, time.perf_counter() - start)
+                row[heap] = best
+            row["winner"] = min(heaps, key=row.get)
+            row["auto"] = _choose_heap(n, 2 * m)
+            rows.append(row)
+            print(" ".join(f"{k}={v:.4f}" if isinstance(v, float) else f"{k}={v}"
+                           for k, v in row.items()))
+    return rows
+
+# benchmark_heaps()
+
 r"""
         (3)
        /  \
@@ -1030,83 +2648,229 @@ r"""
 """       
 
 #Page 54
+r"""
+Union-Find (Disjoint Sets):
+Each set is a tree, its root is the set's representative (leader).
+- FIND:  walk up to the root
+- UNION: hang one root under the other
+
+Two tricks keep the trees flat:
+- union by size: the smaller tree goes under the larger root, so a
+  tree of height h holds at least 2^h nodes, height O(log n)
+- path compression: after a find, point every node we walked past
+  straight at the root (or, halving, at its grandparent)
+Together a find costs O(a(n)), the inverse Ackermann function, which is
+at most 4 for any n we could ever store.
+
+Array representation, elements are 0..n-1:
+    parent[i]: i's parent, roots point to themselves
+    size[i]:   number of elements under root i
+"""
+
+def _sorted_unique(x):
+    """np.unique for int arrays, by one sort (np.unique's hashing is slow here)"""
+    x = np.sort(x)
+    return x[np.r_[True, x[1:] != x[:-1]]] if len(x) else x
+
+class DisjointSet:
+    def __init__(self, n=0, compression="full"):
+        """
+        n singleton sets 0..n-1.
+        compression: "full", "halving" or None (no compression)
+        """
+        if compression not in ("full", "halving", None):
+            raise ValueError(f"Unknown compression '{compression}'.")
+        self.compression = compression
+        self.n = n
+        # flat int64 buffers: plain python ints for find/union, numpy
+        # views over the same memory for find_many/union_many
+        self.parent = array("q", range(n))
+        self.size = array("q", [1]) * n
+
+    def _views(self):
+        """(parent, size) as numpy arrays sharing our buffers"""
+        # taken per call: an array can't grow while a view of it lives
+        return (np.frombuffer(self.parent, dtype=np.int64),
+                np.frombuffer(self.size, dtype=np.int64))
+
+    def add(self):
+        """Add a singleton set, returns its index. Amortized O(1)"""
+        self.parent.append(self.n)
+        self.size.append(1)
+        self.n += 1
+        return self.n - 1
+
+    def find(self, i):
+        """Root of i's tree"""
+        parent = self.parent
+        root = parent[i]
+        if parent[root] == root: # i is a root or right below one, nothing to compress
+            return root
+        if self.compression == "halving":
+            # every node on the way skips to its grandparent
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        while parent[root] != root:
+            root = parent[root]
+        if self.compression == "full":
+            # second pass, point everything we walked past at the root
+            while parent[i] != root:
+                parent[i], i = root, parent[i]
+        return root
+
+    def union(self, a, b):
+        """Merge a's and b's sets by size. False if already together"""
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        size = self.size
+        if size[ra] > size[rb]:
+            ra, rb = rb, ra
+        self.parent[ra] = rb # smaller (or equal) tree under the larger
+        size[rb] += size[ra]
+        return True
+
+    def find_many(self, idx):
+        """
+        Roots of every index in idx at once, one array operation per
+        level. With compression every node we walked past, not just
+        idx, ends up pointing at its root.
+        """
+        parent, _ = self._views()
+        idx = np.asarray(idx, dtype=np.int64)
+        walked = [idx] # walked[k][i] is idx[i]'s k-th ancestor
+        roots = parent[idx]
+        while True:
+            up = parent[roots]
+            if np.array_equal(up, roots):
+                break
+            walked.append(roots)
+            roots = up
+        if self.compression is not None:
+            for nodes in walked:
+                parent[nodes] = roots
+        return roots
+
+    def union_many(self, a, b):
+        """
+        Union every pair (a[i], b[i]). Done in rounds: each pair in
+        different sets hangs its smaller root (by size, then index)
+        under the larger one. When several pairs write the same root
+        one wins and the rest retry next round. Hooks only go up in
+        (size, index), so no cycles, but one round can still hook a
+        chain of roots (think pairs (i, i+1)). So before the next round
+        the hooked roots pointer-jump: all at once, each points at its
+        parent's parent, doubling how far it reaches, until they all
+        point at a root. log(chain) passes, not one pass per link.
+        """
+        parent, size = self._views()
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        while a.size:
+            ra, rb = self.find_many(a), self.find_many(b)
+            apart = ra != rb
+            a, b, ra, rb = a[apart], b[apart], ra[apart], rb[apart]
+            if not a.size:
+                break
+            below = (size[ra] < size[rb]) | ((size[ra] == size[rb]) & (ra < rb))
+            child = np.where(below, ra, rb)
+            parent[child] = np.where(below, rb, ra)
+            hooked = _sorted_unique(child) # each root once, sizes add up below
+            # hooked roots and their new parents, closed under parent
+            # (repeats are fine, they all get the same value written)
+            chain = np.concatenate([hooked, parent[hooked]])
+            while True:
+                grand = parent[parent[chain]]
+                if np.array_equal(grand, parent[chain]):
+                    break
+                parent[chain] = grand
+            # each hooked tree moves, whole, under its final root
+            np.add.at(size, parent[hooked], size[hooked])
+
+    def count(self):
+        """Number of disjoint sets"""
+        parent, _ = self._views()
+        return int(np.count_nonzero(parent == np.arange(self.n)))
+
+    def __len__(self):
+        return self.n
+
 class UnionFind():
     """
     Forest Data structure: 
     What do you call a group of pair-wise disjoint trees? A forest!
     (to me this wasn't obvious at first, and I found it very funny)
+
+    Elements can be anything hashable, each one gets an index into
+    a DisjointSet (self.sets) which does the actual work.
     """
 
     def __init__(self, elements=None, is_compressed=True):
         """
-        Initializes Dictionary (Hash-table) and optionally 
+        Initializes the label tables and optionally 
         takes an array of elements.
         """
         self.is_compressed=is_compressed
-        self.forest = {}
+        self.sets = DisjointSet(compression="full" if is_compressed else None)
+        self.index = {}  # element -> index
+        self.labels = [] # index -> element
+        self.values = {} # element -> data
         if elements:
             for e in elements:
-                self.forest[e] = {"rep": e, "len": 1}
+                self.append(e)
 
     def get(self):
-        """Get forest"""
-        return self.forest
+        """Get forest, {element: {"rep": parent, "len": size}}"""
+        return {e: {"rep": self.labels[self.sets.parent[i]],
+                    "len": int(self.sets.size[i])}
+                for e, i in self.index.items()}
 
     def append(self, e): 
         """Add a tree to the forest"""
-        self.forest[e] = {"rep": e, "len": 1}
+        if e not in self.index:
+            self.index[e] = self.sets.add()
+            self.labels.append(e)
     
     def union(self, a,b):
-        """Union two trees in the forest O(log n)"""
-
-        al, bl = self.forest[a]["len"], self.forest[b]["len"]
-        if al > bl:
-            self.forest[b]["rep"] = a
-            
-        else:
-            self.forest[a]["rep"] = b
-            
-        self.forest[a]["len"] = bl + al
-        self.forest[b]["len"] = bl + al
+        """Union the trees holding a and b, O(log n)"""
+        return self.sets.union(self.index[a], self.index[b])
     
     def find(self, e):
         """
         Find an element's leader, compress graph after the find.
-        This means settings e's rep directly to its leader
+        This means settings e's rep (and everything above it)
+        directly to its leader
         O(log n)
         """
-        traversed = False
-        old = self.forest[e]["rep"]
-        who = self.forest[e]["rep"]
-        while(self.forest[who]["rep"] != who):
-            traversed = True
-            who = self.forest[who]["rep"]
-        # Compress
-        
-        if traversed and self.is_compressed:
-            # Update the old leader's new party length
-            self.forest[e]["rep"] = who
-        return who
+        return self.labels[self.sets.find(self.index[e])]
+
     def give(self, e, d):
         """Give element a data to hold onto"""
-        self.forest[e]["data"] = d
+        self.values[e] = d
 
     def parents(self):
         """Returns a (index:child, value: parent) array"""
-        p = {}
-        for i in self.forest:
-            p[i] = self.forest[i]["rep"]
-        return p
+        parent = self.sets.parent
+        return {e: self.labels[parent[i]] for e, i in self.index.items()}
+
     def data(self):
         """Returns a (index:node, value: data) array"""
-        p = {}
-        for i in self.forest:
-            p[i] = self.forest[i]["data"]
-        return p
+        return {e: self.values.get(e) for e in self.index}
 
     def __str__(self):
         """String representation of forest"""
-        return str(self.forest)
+        return str(self.get())
+
+"""
+Time complexity: O(a(n)) amortized per find/union, a(n) <= 4 in practice.
+find_many is one array operation per level of the trees, union_many one
+find_many per round plus O(log k) jumping passes over the k roots it
+hooked.
+
+Space complexity: O(n), two int arrays plus the label tables.
+"""
 
 # Figure 5.10
 # E = ['a','b','c','d','e']
@@ -1147,22 +2911,18 @@ def kruskals(G):
         We can track this with a UnionFind data structure. This will tell 
         us if a node is already part of a group
     """
-    edges = TupleMinHeap()
-    keys = list(G.keys())
+    keys = list(G)
     T = UnionFind(keys)
-    MST = {}
-    for v in G:
-        MST[v] = []
-        for u in G[v]:
-            # (weight, parent, child)
-            edges.insert((u[0],v,u[1]))
-    W = len(edges.get())
-    i = 0
-    while(i < W) and (i < len(G)):
-        w,v,u = edges.extract_min()
-        if T.find(v) != T.find(u):
-            T.union(v,u)
+    MST = {v: [] for v in keys}
+    # (weight, parent, child), heapified all at once in O(m)
+    edges = Heap((u[0],v,u[1]) for v in G for u in G[v])
+    added = 0
+    # a spanning tree has n-1 edges, stop once we have them
+    while edges and added < len(keys) - 1:
+        w,v,u = edges.pop()
+        if T.union(v,u): # False when v and u are already connected
             MST[v].append(u)
+            added += 1
     return MST
 
 
@@ -1194,6 +2954,183 @@ r"""
 
 # print(kruskals(K))
 
+r"""
+Boruvka's algorithm:
+Kruskal grows one forest edge at a time, Prim grows one tree. Boruvka
+grows every tree at once:
+    - every component picks its cheapest edge leaving it
+    - add all of those edges, contract the components they join
+    - repeat until no edge leaves any component
+Each round at least halves the number of components, so there are at
+most log n rounds. Finding the cheapest edges is independent per edge,
+so we split the edge array between worker processes (shared memory,
+like multi_source_dijkstra) and merge their per-component minimums.
+
+The edges are sorted by weight once up front, so "cheapest" is just the
+smallest edge index. That also breaks ties consistently, the cheapest
+edges are unique and the edges added in a round can't form a cycle.
+
+Each worker keeps a fixed slice of the edge array, and every round does
+all of the per-edge work on its own slice:
+    - relabel: the edge's ends become their components' new labels
+    - contract: drop edges inside a component, pack the rest to the
+      front of the slice (so edge order, i.e. weight order, is kept)
+    - pick the cheapest edge leaving each component in the slice
+The edges store component labels, not nodes, so the only thing the
+parent does per round is merge the workers' picks and work out the new
+labels of the components that just merged, O(k log k) for k picks.
+Cheapest-per-component uses a scratch array per process that is never
+cleared, so nothing per round costs O(n).
+label[c] is only rewritten for those, every other label stays put.
+"""
+
+def _undirected_edges(G):
+    """(n, u, v, w) arrays, one entry per stored edge, u < v, no self loops"""
+    if not isinstance(G, CSRGraph):
+        G = CSRGraph.from_dict(G)
+    u = np.repeat(np.arange(G.n, dtype=np.int64), np.diff(G.offsets))
+    v = G.targets.astype(np.int64)
+    keep = u != v
+    w = G.weights if G.weights is not None else np.zeros(G.m) # edgeless dict
+    u, v, w = u[keep], v[keep], w[keep]
+    return G.n, np.minimum(u, v), np.maximum(u, v), w
+
+def _min_edge_per_component(c, e, best):
+    """
+    For each component in c, its smallest edge index in e. best is
+    scratch space with a slot per component label, left dirty: we only
+    read slots we wrote this call, so it's never cleared (no O(n) work).
+    """
+    best[c] = e
+    np.minimum.at(best, c, e)
+    won = e == best[c] # exactly one entry per component, edges are distinct
+    return c[won], e[won]
+
+def _boruvka_slice(a, best, lo, end):
+    """
+    One round on the live edges [lo, end) of a slice: relabel, contract,
+    then the cheapest edge leaving each component. Returns the slice's
+    new end and (components, edge indices).
+    """
+    label, cu, cv, idx = a["label"], a["cu"], a["cv"], a["idx"]
+    su, sv = label[cu[lo:end]], label[cv[lo:end]]
+    keep = np.flatnonzero(su != sv)
+    live = len(keep)
+    cu[lo:lo + live], cv[lo:lo + live] = su[keep], sv[keep]
+    idx[lo:lo + live] = idx[lo:end][keep]
+    su, sv = cu[lo:lo + live], cv[lo:lo + live]
+    edges = np.arange(lo, lo + live)
+    # an edge leaves both of its endpoints' components
+    c, e = _min_edge_per_component(np.concatenate([su, sv]),
+                                   np.concatenate([edges, edges]), best)
+    return lo + live, c, e
+
+def _init_boruvka_worker(meta):
+    blocks, arrays = _attach_arrays(meta)
+    _worker["blocks"] = blocks
+    _worker["edges"] = arrays
+    _worker["best"] = np.empty(len(arrays["label"]), dtype=np.int64)
+
+def _boruvka_task(bounds):
+    return _boruvka_slice(_worker["edges"], _worker["best"], *bounds)
+
+def boruvka(G, s=0, workers=None):
+    """
+    Boruvka's MST, parallel over 'workers' processes (default: one per
+    core). Returns the same parent table as prims, rooted at s.
+    """
+    n, u, v, w = _undirected_edges(G)
+    # sorted by weight (stable), an edge's index now breaks weight ties
+    order = np.argsort(w, kind="stable")
+    u, v = u[order], v[order] # the weights aren't needed past this point
+    m = len(u)
+    workers = workers or os.cpu_count() or 1
+    arrays = {"label": np.arange(n, dtype=np.int64), # component -> its new label
+              "cu": u.copy(), "cv": v.copy(),        # edge ends, as components
+              "idx": np.arange(m, dtype=np.int64)}   # edge, in the sorted u, v
+    blocks, pool = [], None
+    if workers > 1:
+        blocks, meta = _share_arrays(arrays)
+        # work on the shared copies directly, the workers see every update
+        arrays = {name: np.ndarray(a.shape, a.dtype, buffer=shm.buf)
+                  for (name, a), shm in zip(arrays.items(), blocks)}
+        pool = Pool(workers, _init_boruvka_worker, (meta,))
+    label, cu, cv, idx = arrays["label"], arrays["cu"], arrays["cv"], arrays["idx"]
+    step = -(-m // workers) if m else 1
+    slices = [(lo, min(lo + step, m)) for lo in range(0, m, step)] # (start, live end)
+    best = np.empty(n, dtype=np.int64)
+    mst = []
+    try:
+        while slices:
+            if pool is None:
+                parts = [_boruvka_slice(arrays, best, *b) for b in slices]
+            else:
+                parts = pool.map(_boruvka_task, slices)
+            slices = [(b[0], p[0]) for b, p in zip(slices, parts) if p[0] > b[0]]
+            c, e = _min_edge_per_component(np.concatenate([p[1] for p in parts]),
+                                           np.concatenate([p[2] for p in parts]), best)
+            if not len(e):
+                break
+            chosen = _sorted_unique(e) # two components can pick the same edge
+            mst.append(np.stack([u[idx[chosen]], v[idx[chosen]]]))
+            # merge the chosen edges' components, on just those labels
+            ends = _sorted_unique(np.concatenate([cu[chosen], cv[chosen]]))
+            merged = DisjointSet(len(ends))
+            merged.union_many(np.searchsorted(ends, cu[chosen]),
+                              np.searchsorted(ends, cv[chosen]))
+            label[ends] = ends[merged.find_many(np.arange(len(ends)))]
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+            del arrays, label, cu, cv, idx # views have to go before their buffers
+            _release_arrays(blocks)
+    # root the forest at s, parents like prims
+    mst = np.concatenate(mst, axis=1) if mst else np.zeros((2, 0), dtype=np.int64)
+    T = CSRGraph.from_edges(np.r_[mst[0], mst[1]], np.r_[mst[1], mst[0]], n=n)
+    return _tree_parents(T, s)
+
+def _tree_parents(T, s, small=64):
+    """
+    Parents of every node reachable from s in the forest T, None for the
+    rest. Level by level like frontier_bfs, but levels under 'small'
+    nodes are walked in python: a tree can be n levels deep (a path),
+    and a numpy level costs a few calls however few nodes it has.
+    In a tree each new node is reached from exactly one frontier node,
+    so no ties to break.
+    """
+    offsets, targets = T.offsets.tolist(), T.targets.tolist()
+    parent = np.full(T.n, -1, dtype=np.int64)
+    parent[s] = s
+    frontier = [s]
+    while len(frontier):
+        if len(frontier) < small:
+            found = []
+            for x in (frontier if isinstance(frontier, list) else frontier.tolist()):
+                for y in targets[offsets[x]:offsets[x+1]]:
+                    if parent[y] < 0:
+                        parent[y] = x
+                        found.append(y)
+            frontier = found
+        else:
+            src, edges = T.frontier_edges(frontier)
+            y = T.targets[edges]
+            new = parent[y] < 0
+            parent[y[new]] = src[new]
+            frontier = y[new]
+    parent[s] = -1
+    return [None if p < 0 else p for p in parent.tolist()]
+
+"""
+Time complexity: O(m log n) work over at most log n rounds. The edge
+work of each round (relabel, contract, scan) is split across the
+workers, the parent only does O(k log k) for the k components merged.
+
+Space complexity: O(n+m), one shared copy of the edge arrays.
+"""
+
+# print(boruvka(K)) # [None, 0, 0, 2, 2, 4, 4, 5], same as prims(K,0)
+
 """
 -----------------DYNAMIC PROGRAMMING-----------------
 The act of utilizing memoization to build a solution
@@ -1214,7 +3151,7 @@ hence O(2^n) calls.
 
 # print(plain_fib(38)) # Super Slow!!!
 
-def memo_fib(n):
+def memo_fib(n, chunk=500):
     """Memo Fibinocci"""
     M = {}
     def rec(m):
@@ -1225,17 +3162,21 @@ def memo_fib(n):
             return m
         M[m] = rec(m-1) + rec(m-2)
         return M[m]
-    rec(n)
-    return M[n]
+    # fill the table from the bottom, 'chunk' at a time, so no call
+    # recurses more than chunk deep before hitting a saved value
+    for m in range(chunk, n, chunk):
+        rec(m)
+    return rec(n)
 """
 Time complexity: O(n). We only need to compute each recursive call once.
 We start with n, and keep going to the base case. Every other call is some
 combination of calls we've made before.
 
-Space complexity: O(n). For the levels of recursion on the stack.
+Space complexity: O(n). For the table, the stack only goes chunk deep.
 """
 
 # print(memo_fib(100)) #Way Faster
+# print(memo_fib(5000) == fib(5000)) # no recursion limit
 
 def fib(n):
     """
@@ -1244,6 +3185,8 @@ def fib(n):
     memo-table. Then preform our recursive steps, building off of 
     our memo
     """
+    if n <= 1:
+        return n
     M = [0] * (n+1) # we know there's only n levels of recursion
     M[0] = 0
     M[1] = 1
@@ -1256,6 +3199,138 @@ Space complexity: O(n).
 """
 # print(fib(100))
 
+"""
+Fast doubling:
+Don't walk up one index at a time, jump. From F(k) and F(k+1):
+    F(2k)   = F(k) * (2F(k+1) - F(k))
+    F(2k+1) = F(k)^2 + F(k+1)^2
+Read n's bits from the top: each bit doubles k, and a 1 bit adds one
+more step. That's log n rounds instead of n.
+
+Any recurrence a(n) = c1 a(n-1) + ... + ck a(n-k) works the same way
+with its companion matrix T, which moves the window (a(n), ..., a(n+k-1))
+forward one step, so T^n moves it n steps. T^n is a product of the
+squares T, T^2, T^4, ... for the 1 bits of n. Those squares don't depend
+on n, so keep them and every later query just multiplies the window by
+the ones it needs. For a batch of sorted n we go further and only move
+the window from one n to the next, by the difference.
+
+With mod, everything is reduced as we go, so numbers stay small. Without
+it, F(n) has about 0.7n bits, big ints but exact.
+"""
+
+_fib_cache = OrderedDict() # LRU of recent (n, mod) -> F(n)
+
+def fast_fib(n, mod=None, cache=128):
+    """F(n), optionally mod 'mod', by fast doubling"""
+    if n < 0:
+        raise ValueError("n must be non-negative.")
+    if (n, mod) in _fib_cache:
+        _fib_cache.move_to_end((n, mod))
+        return _fib_cache[(n, mod)]
+    a, b = 0, 1 # F(k), F(k+1) with k = 0
+    for bit in bin(n)[2:]:
+        c = a * (2*b - a) # F(2k)
+        d = a*a + b*b     # F(2k+1)
+        if mod is not None:
+            c, d = c % mod, d % mod
+        a, b = (d, c + d) if bit == "1" else (c, d)
+        if mod is not None:
+            b %= mod
+    _fib_cache[(n, mod)] = a
+    if len(_fib_cache) > cache:
+        _fib_cache.popitem(last=False) # least recently used
+    return a
+
+class LinearRecurrence:
+    """
+    a(n) = coeffs[0] a(n-1) + coeffs[1] a(n-2) + ... + coeffs[k-1] a(n-k)
+    from a(0..k-1) = initial, optionally mod 'mod'.
+    """
+
+    def __init__(self, coeffs, initial, mod=None, cache=128):
+        if len(coeffs) != len(initial) or not coeffs:
+            raise ValueError("Need k coefficients and k initial terms, k >= 1.")
+        self.k = len(coeffs)
+        self.mod = mod
+        self.initial = [self._reduce(x) for x in initial]
+        # companion matrix: shift the window, last row makes the new term
+        T = [[int(c == r + 1) for c in range(self.k)] for r in range(self.k - 1)]
+        T.append([self._reduce(c) for c in reversed(coeffs)])
+        self.powers = [T] # powers[j] = T^(2^j), squared as needed
+        self.cache = OrderedDict()
+        self.max_cache = cache
+
+    def _reduce(self, x):
+        return x if self.mod is None else x % self.mod
+
+    def _power(self, j):
+        while len(self.powers) <= j:
+            P = self.powers[-1]
+            self.powers.append([[self._reduce(sum(P[r][i] * P[i][c] for i in range(self.k)))
+                                 for c in range(self.k)] for r in range(self.k)])
+        return self.powers[j]
+
+    def _advance(self, window, steps):
+        """The window moved 'steps' indices forward"""
+        j = 0
+        while steps:
+            if steps & 1:
+                P = self._power(j)
+                window = [self._reduce(sum(P[r][i] * window[i] for i in range(self.k)))
+                          for r in range(self.k)]
+            steps >>= 1
+            j += 1
+        return window
+
+    def _remember(self, n, value):
+        self.cache[n] = value
+        self.cache.move_to_end(n)
+        if len(self.cache) > self.max_cache:
+            self.cache.popitem(last=False)
+
+    def __getitem__(self, n):
+        """a(n) in O(k^2 log n), the squares are shared between calls"""
+        if n < 0:
+            raise ValueError("n must be non-negative.")
+        if n in self.cache:
+            self.cache.move_to_end(n)
+            return self.cache[n]
+        value = self._advance(self.initial, n)[0]
+        self._remember(n, value)
+        return value
+
+    def terms(self, ns):
+        """
+        a(n) for every n in ns, in the same order. Walks the sorted n's
+        once, moving the window by the gap between neighbours.
+        """
+        ns = list(ns)
+        out = [None] * len(ns)
+        window, at = self.initial, 0
+        for i in sorted(range(len(ns)), key=ns.__getitem__):
+            if ns[i] < 0:
+                raise ValueError("n must be non-negative.")
+            window, at = self._advance(window, ns[i] - at), ns[i]
+            out[i] = window[0]
+        return out
+
+"""
+Time complexity: fast_fib O(log n) big-int multiplications. For a k term
+recurrence, a(n) is O(k^2 log n) plus O(k^3) per new square. A sorted
+batch of q n's up to N costs O(k^2 (q + log N)) on top of the squares.
+(All counts are arithmetic operations, without mod each on an O(n) bit
+number.)
+
+Space complexity: O(k^2 log N) for the squares, plus the LRU cache.
+"""
+
+# print(fast_fib(100), fast_fib(10**6, mod=10**9+7))
+# FIB = LinearRecurrence([1, 1], [0, 1], mod=10**9+7)
+# print(FIB[10**6], FIB.terms([10**6, 10, 10**5])) # same as fast_fib
+# tribonacci = LinearRecurrence([1, 1, 1], [0, 0, 1])
+# print([tribonacci[i] for i in range(10)]) # [0, 0, 1, 1, 2, 4, 7, 13, 24, 44]
+
 """
 Weighted interval Scheduling:
 
@@ -1278,36 +3353,71 @@ We state our sub-problems (going from n->0):
     }
 """
 
-def next_compatible(S,i):
-    for j in range(i,len(S)):
-        if is_compatible(S[i],S[j]):
-            return j 
-    return -1
+"""
+Instead of scanning forward for the next compatible job (O(n) per job),
+sort by finish time once. Then p(j), the last job that ends by the time
+job j starts, is a binary search of job j's start in the sorted finish
+times, and numpy's searchsorted does it for every job in one call.
+
+In finish order (1-indexed, M[0] = 0 for no jobs):
+    M[j] = max(value[j] + M[p(j)], M[j-1])
+Job j is in the solution exactly when taking it is what gave M[j], so we
+walk back from M[n]: take j and jump to p(j), or skip to j-1.
+"""
+
+def weighted_interval_arrays(start, finish, value):
+    """
+    Weighted interval scheduling on columns. Returns (best total value,
+    indices of the chosen jobs in finish order).
+    """
+    start, finish, value = np.asarray(start), np.asarray(finish), np.asarray(value)
+    n = len(start)
+    order = key_argsort(finish, start) # zero length jobs after the rest of a tie
+    # p[j]: number of jobs finishing by job j's start, capped at j so a
+    # zero length job can't count itself
+    p = np.searchsorted(finish[order], start[order], side="right")
+    p = np.minimum(p, np.arange(n)).tolist()
+    v = value[order].tolist()
+    M = [0] # M[j] is appended right after M[j-1], M[p[j]] is always there
+    best = 0
+    for vj, pj in zip(v, p):
+        take = vj + M[pj]
+        if take > best:
+            best = take
+        M.append(best)
+    return M[n], order[wis_backtrack(M, p, v)]
+
+def wis_backtrack(M, p, v):
+    """Positions (in finish order) of the jobs behind M[n], ascending"""
+    j = len(M) - 1
+    sol = []
+    while j > 0:
+        if v[j-1] + M[p[j-1]] >= M[j-1]:
+            sol.append(j-1)
+            j = p[j-1]
+        else:
+            j -= 1
+    sol.reverse()
+    return sol
+
 def weighted_interval_schedule(S):
     """
-    Time complexity: O(n); Space complexity: O(n)
+    S is a list of (start, finish, value). Returns (best total value,
+    indices into S of the chosen jobs), S itself is left as is.
     """
-    n = len(S)
-    M = [None] * n # adding the base case shifts over our array
-    M[0] = 0
-    interval_eft_sort(S)
-    print(S)
-    for i in range(1, n):
-        compatible = next_compatible(S,i)
-        # add the next compatible, if there's none, add 0
-        build = S[compatible][2] if compatible > -1 else 0
-        next = M[i-1]
-        print(f"i:{i} compat: {compatible} i+j: ({S[i][2]} + {S[compatible][2]}) build: {build}, next: {next}")
-        M[i] = max(S[i][2]+build, next)
-    return M
+    if not S:
+        return 0, []
+    start, finish, value = zip(*((s[0], s[1], s[2]) for s in S))
+    best, chosen = weighted_interval_arrays(start, finish, value)
+    return best, chosen.tolist()
+
+"""
+Time complexity: O(n log n), the sort and the n binary searches. The DP
+and the backtrack are one O(n) pass each.
+
+Space complexity: O(n), M, p and the sorted columns.
+"""
 
-# Decided to spare my time on implementing the compatible find backwards
-# def wis_backtrack(S,M): 
-#     n = len(M)-1
-#     sol = []
-#     while n > 0:
-#         ...
-#     return sol
 #(start, finish, value)
 # Figure 8.2, though zero-indexed
 S = [
@@ -1320,11 +3430,10 @@ S = [
     (6,10,9),  
     (8,11,8)   
     ]
-# A = weighted_interval_schedule(S)
-# print(A)
+# print(weighted_interval_schedule(S)) # (30, [0, 3, 7])
 
 #p84
-def subset_sum(A, W):
+def subset_sum(A, W, path=None):
     """
     Subset Sum (Weighted Ceiling)
     Given a set of integers, say S = {3, 6, 1, 7, 2}, 
@@ -1333,7 +3442,13 @@ def subset_sum(A, W):
 
     2d problems, 2d combinations
     we track both weight and index
+
+    path: build the table in an .npy file instead, returned memory-mapped
+          (see dp_table_on_disk)
     """
+    if path is not None:
+        whole = all(isinstance(a, (int, np.integer)) for a in A)
+        return dp_table_on_disk(path, A, W, W, _subset_sum_row, whole)
     n = len(A)
     # Don't do this VVVVV it makes all rows reference the same array
     # M = [[0] * (W+1)] * (n + 1)
@@ -1363,7 +3478,7 @@ def subset_sum_backtrack(A,M):
         # print (f"M[{i}][{W}] > M[{i-1}][{W}]: {M[i][W]} > {M[i-1][W]} ")
         if(M[i][W] > M[i-1][W]):
             sol.append(A[i-1])
-            W -= A[i]
+            W -= A[i-1]
         i -= 1
     return sol
 
@@ -1372,13 +3487,95 @@ arr = [2,7,1,6,3]
 # S = subset_sum(arr, 9)
 # print(subset_sum_backtrack(arr,S))
 
+"""
+Subset sum as a bitset:
+Row i of M only asks "which sums w <= W can items 1..i reach?", one bit
+per sum. Taking item a moves every reachable sum up by a, so the next
+row is the old one OR itself shifted by a:
+    reach_i = reach_{i-1} | (reach_{i-1} << a)
+Packed 64 sums to a uint64 word, that's W/64 word operations per item
+in numpy instead of W python steps, and one row of memory instead of n.
+
+For the subset we don't need the rows: remember first[w], the item that
+first made sum w reachable. When item i did that, w - A[i] was already
+reachable with items before i, whose own first[] is earlier still, so
+walking w -> w - A[first[w]] never uses an item twice.
+"""
+
+def _shifted(bits, a):
+    """The packed bitset moved up by a bits, overflow past the end dropped"""
+    q, r = divmod(a, 64)
+    out = np.zeros_like(bits)
+    if q >= len(bits):
+        return out
+    src = bits[:len(bits) - q]
+    if r == 0:
+        out[q:] = src
+    else:
+        out[q:] = src << np.uint64(r)
+        out[q+1:] |= src[:-1] >> np.uint64(64 - r) # bits carried into the next word
+    return out
+
+def subset_sum_bitset(A, W):
+    """
+    Largest subset sum of A that is at most W, with O(W) memory.
+    Returns (best, the values of a subset reaching it).
+    """
+    words = W // 64 + 1
+    last = np.uint64((1 << (W % 64 + 1)) - 1) # sums in the last word that are <= W
+    reach = np.zeros(words, dtype=np.uint64)
+    reach[0] = 1 # the empty subset reaches 0
+    first = np.full(W + 1, -1, dtype=np.int32)
+    bit = np.arange(64, dtype=np.uint64)
+    for i, a in enumerate(A):
+        if a <= 0 or a > W:
+            continue
+        new = _shifted(reach, a) & ~reach
+        new[-1] &= last
+        changed = np.flatnonzero(new)
+        if len(changed) == 0:
+            continue
+        # every sum turns on at most once, so this is O(W) over all items
+        hit = (new[changed, None] >> bit) & np.uint64(1)
+        w = (changed[:, None] * 64 + np.arange(64))[hit.astype(bool)]
+        first[w] = i
+        reach |= new
+    top = np.flatnonzero(reach)[-1]
+    best = int(top) * 64 + int(reach[top]).bit_length() - 1
+    sol = []
+    w = best
+    while w > 0:
+        sol.append(A[first[w]])
+        w -= A[first[w]]
+    sol.reverse()
+    return best, sol
+
+"""
+Time complexity: O(nW/64) word operations, plus O(W) to record when each
+sum first turns on and O(n) to walk the subset back.
+
+Space complexity: O(W), W/8 bytes of bits and the int32 first[] array.
+"""
+
+# print(subset_sum_bitset(arr, 9)) # (9, [2, 7])
 
-def unbounded_knapsack(A, W):
+
+def unbounded_knapsack(A, W, path=None):
     """
     Unbounded Knapsack:
         Subset sum, but each item can be taken infinitely and has 
         a value to be taken.
+
+    path: build the table in an .npy file instead, returned memory-mapped
+          (see dp_table_on_disk)
     """
+    if path is not None:
+        # no packing beats the best value per unit of weight, and whole
+        # values only add up to whole totals, so that bound rounds down
+        whole = all(isinstance(v, (int, np.integer)) for v, _ in A)
+        bound = max((W * v // wi if whole else W * v / wi for v, wi in A if wi > 0),
+                    default=0)
+        return dp_table_on_disk(path, A, W, bound, _unbounded_knapsack_row, whole)
     n = len(A)
     M = [[0] * (W + 1) for _ in range(n+1)]
     
@@ -1399,11 +3596,12 @@ def unbounded_knapsack_backtrack(A,M):
     sol = []
     W = len(M[-1])-1
 
-    i = len(A)-1
+    i = len(A) # row n holds every item
     while i > 0:
         v = A[i-1][0]
         wi = A[i-1][1]
-        if W >= wi and (v + M[i-1][W] > M[i-1][W]):
+        # item i was taken if it's what gave M[i][W] (it stays on row i)
+        if W >= wi and int(M[i][W]) == v + int(M[i][W-wi]): # int: M may be uint8 on disk
             sol.append(A[i-1])
             W -= wi
         else:
@@ -1434,7 +3632,286 @@ arr = [(1,1),(6,2),(18,5),(22,6),(28,7)]
 
         
 
+"""
+Unbounded knapsack in one row:
+Row i of M only looks at itself and row i-1, so keep one array of W+1
+values and update it in place for each item. With item i = (v, wi),
+capacities w = r, r + wi, r + 2wi, ... (one residue class r mod wi) only
+talk to each other. Write x_j for the old value at r + j*wi, taking k
+copies of item i from r + (j-k)*wi gives:
+    y_j = max over k <= j of x_k + (j - k)v
+        = j*v + max over k <= j of (x_k - k*v)
+and the running max is numpy's maximum.accumulate. Reshaping the row to
+(W/wi, wi) puts each residue class in its own column, so one accumulate
+down the columns does the whole item.
+
+For the solution remember last[w], the last item that improved w. That
+item is in some best packing of w, and w - wi is packed with value
+M[w] - v, so walking w -> w - wi gives every item, O(W) memory.
+"""
+
+def _unbounded_knapsack_row(M, item):
+    """The row after M once item = (value, weight) may be taken, a new array"""
+    v, wi = item
+    W = len(M) - 1
+    if wi <= 0 or wi > W:
+        return M.copy()
+    rows = -(-(W + 1) // wi) # ceil
+    x = np.empty(rows * wi, dtype=M.dtype)
+    x[:W+1] = M
+    x[W+1:] = 0 # padding, past W so never read back
+    y = x.reshape(rows, wi) # column r is residue class r
+    k = (np.arange(rows) * v).astype(M.dtype)[:, None]
+    y -= k
+    np.maximum.accumulate(y, axis=0, out=y)
+    y += k
+    return x[:W+1]
+
+def unbounded_knapsack_1d(A, W):
+    """
+    A is a list of (value, weight). Returns (best value, how many of each
+    item to take), with O(W) memory.
+    """
+    values = np.array([a[0] for a in A])
+    dtype = np.result_type(values, np.int64)
+    M = np.zeros(W + 1, dtype=dtype)
+    last = np.full(W + 1, -1, dtype=np.int32)
+    for i, (v, wi) in enumerate(A):
+        if wi <= 0 or wi > W:
+            continue
+        y = _unbounded_knapsack_row(M, (v, wi))
+        better = y > M
+        M[better] = y[better]
+        last[better] = i
+    count = [0] * len(A)
+    w = W
+    while last[w] >= 0:
+        count[last[w]] += 1
+        w -= A[last[w]][1]
+    return M[W].item(), count
+
+"""
+Time complexity: O(nW), but as O(n) vectorized passes over W values,
+and O(W) for the walk back.
+
+Space complexity: O(W), the value row, last[] and one scratch row.
+"""
+
+# print(unbounded_knapsack_1d(arr, 11)) # (40, [0, 0, 1, 1, 0]), (18,5) and (22,6)
+
+"""
+DP tables on disk:
+Sometimes we want the whole table, not just M[n][W], e.g. to ask "what
+is the best with the first i items and capacity w?" for many (i, w)
+without solving again. When (n+1)(W+1) entries don't fit in memory,
+the table goes to an .npy file through a memory map:
+- the entry type is the smallest that holds every value the table can
+  reach: uint8, uint16, uint32 or uint64 (float64 for fractional values)
+- rows are computed one at a time as vectorized numpy passes (each row
+  only needs the previous one), collected into a block of rows of about
+  'block' bytes, and the block is written out in one go
+Since it's a plain .npy file, np.load(path, mmap_mode="r") opens it again
+later, and M[i][w] reads just that entry's page from disk.
+"""
+
+def _table_dtype(bound, whole=True):
+    """Smallest unsigned type holding 0..bound, float64 for fractional values"""
+    if not whole:
+        return np.dtype(np.float64)
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if bound <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    raise OverflowError(f"Table values up to {bound} don't fit in 64 bits.")
+
+def _subset_sum_row(M, a):
+    """The subset_sum row after M once a may be taken, a new array"""
+    row = M.copy()
+    if 0 < a < len(M):
+        np.maximum(M[a:], M[:-a] + a, out=row[a:])
+    return row
+
+def dp_table_on_disk(path, A, W, bound, step, whole=True, block=2**24):
+    """
+    Fill the (n+1) x (W+1) table M[i] = step(M[i-1], A[i-1]), M[0] = 0,
+    into the .npy file at path. bound is the largest value any entry can
+    take, whole says whether every value is an integer. Returns the
+    finished table, memory-mapped read-only.
+    """
+    n = len(A)
+    work = np.int64 if whole else np.float64 # room for x - k*v
+    M = np.lib.format.open_memmap(path, mode="w+", dtype=_table_dtype(bound, whole),
+                                  shape=(n + 1, W + 1))
+    rows = max(1, block // ((W + 1) * 8))
+    buffer = np.empty((rows, W + 1), dtype=work)
+    row = np.zeros(W + 1, dtype=work)
+    M[0] = 0
+    for lo in range(1, n + 1, rows):
+        hi = min(lo + rows, n + 1)
+        for i in range(lo, hi):
+            row = step(row, A[i-1])
+            buffer[i - lo] = row
+        M[lo:hi] = buffer[:hi - lo]
+    M.flush()
+    del M
+    return load_dp_table(path)
+
+def load_dp_table(path):
+    """Reopen a table written by dp_table_on_disk, M[i][w] without recomputing"""
+    return np.load(path, mmap_mode="r")
+
+"""
+Time complexity: O(nW) for subset_sum/unbounded_knapsack with path, as
+n vectorized row passes. A lookup in a reopened table is O(1).
+
+Space complexity: O(block + W) in memory, (n+1)(W+1) entries of 1 to 8
+bytes on disk.
+"""
 
+# M = unbounded_knapsack(arr, 11, path="knapsack.npy")
+# print(M.dtype, M[5][11]) # uint8 40
+# M = load_dp_table("knapsack.npy") # later, no recomputing
+# print(unbounded_knapsack_backtrack(arr, M))
 
+"""
+Small n, huge W:
+Every table above is O(nW), with W = 10^12 that's hopeless even as
+bits. But with n around 40 there are only 2^40 subsets, and we don't
+need all of them.
+
+Meet in the middle (subset sum): split A into halves L and R, about
+2^20 subset sums each. Enumerate them by doubling, the sums of the
+first j items are the old sums, then the old sums plus item j, so
+position m holds the subset whose bits are m (the mask). Sort R's
+sums, then for every sum s of L the best partner is the largest sum of
+R that is <= W - s: one searchsorted for all of L at once.
+
+Branch and bound (knapsack): depth first over the items, best value per
+unit of weight first, deciding how many of item i to take (0/1: take
+it or not). The fractional bound, filling what capacity is left with
+the remaining items as if they could be cut, is never below what a
+branch can actually reach. So when it's no better than the best
+packing found so far, the whole branch is skipped.
+"""
+
+def _half_sums(A):
+    """Sums of all 2^len(A) subsets, sums[mask] for mask bits over A"""
+    sums = np.zeros(1, dtype=np.int64)
+    for a in A:
+        sums = np.concatenate([sums, sums + a])
+    return sums
+
+def subset_sum_mitm(A, W):
+    """
+    Largest subset sum of A that is at most W, in O(2^(n/2) n) for any W.
+    Returns (best, the values of a subset reaching it).
+    """
+    h = len(A) // 2
+    left, right = _half_sums(A[:h]), _half_sums(A[h:])
+    order = np.argsort(right, kind="stable")
+    right = right[order]
+    fits = np.flatnonzero(left <= W)
+    left = left[fits]
+    j = np.searchsorted(right, W - left, side="right") - 1 # right[0] = 0, always >= 0
+    total = left + right[j]
+    k = int(np.argmax(total))
+    best = int(total[k])
+    lmask, rmask = int(fits[k]), int(order[j[k]])
+    sol = [A[i] for i in range(h) if lmask >> i & 1]
+    sol += [A[h + i] for i in range(len(A) - h) if rmask >> i & 1]
+    return best, sol
+
+def knapsack_branch_bound(A, W, unbounded=True):
+    """
+    A is a list of (value, weight). Returns (best value, how many of each
+    item to take), each count 0 or 1 with unbounded=False.
+    """
+    count = [0] * len(A)
+    items = sorted((i for i, (v, wi) in enumerate(A) if 0 < wi <= W and v > 0),
+                   key=lambda i: A[i][0] / A[i][1], reverse=True)
+    values = [A[i][0] for i in items]
+    weights = [A[i][1] for i in items]
+    n = len(items)
+
+    # whole values can only add up to whole totals, so floor the bound
+    whole = all(isinstance(v, (int, np.integer)) for v in values)
+
+    def bound(j, cap, value):
+        """value plus the fractional fill of cap with items j.."""
+        if unbounded: # item j has the best ratio of what's left
+            if j == n:
+                return value
+            return value + (cap * values[j] // weights[j] if whole
+                            else cap * values[j] / weights[j])
+        for j in range(j, n):
+            if weights[j] > cap:
+                return value + (cap * values[j] // weights[j] if whole
+                                else cap * values[j] / weights[j])
+            cap -= weights[j]
+            value += values[j]
+        return value
+
+    best, best_take = 0, ()
+    # (item j, copies k of it to take, capacity left, value so far and
+    # (item, copies) taken so far, all before item j). Fewer copies of the
+    # best-ratio item never raise the bound, so once k copies can't beat
+    # best neither can k-1, and "try k-1" is pushed only after k is tried.
+    # That keeps at most two entries per item on the stack, whatever W is.
+    most = lambda j, cap: cap // weights[j] if unbounded else int(weights[j] <= cap)
+    stack = [(0, most(0, W), W, 0, ())] if n else []
+    while stack:
+        j, k, cap, value, take = stack.pop()
+        left, got = cap - k * weights[j], value + k * values[j]
+        if bound(j + 1, left, got) <= best:
+            continue
+        if k > 0: # the same item with one copy less, tried after this branch
+            stack.append((j, k - 1, cap, value, take))
+        if k:
+            take += ((items[j], k),)
+        if got > best:
+            best, best_take = got, take
+        if j + 1 < n:
+            stack.append((j + 1, most(j + 1, left), left, got, take))
+    for i, k in best_take:
+        count[i] = k
+    return best, count
+
+def solve_subset_sum(A, W, max_bits=2**25):
+    """
+    subset_sum for any n and W, returns (best, subset values). Bitset DP
+    while W fits in max_bits, meet in the middle when n is small and
+    that's the cheaper of the two.
+    """
+    n = len(A)
+    mitm = 2 ** (n / 2) * max(n, 1) # sums built and searched
+    dp = n * (W / 64 + 1)          # word operations
+    if n <= 48 and (mitm < dp or W > max_bits):
+        return subset_sum_mitm(A, W)
+    if W <= max_bits:
+        return subset_sum_bitset(A, W)
+    raise ValueError(f"Neither W = {W} nor n = {n} is small enough.")
+
+def solve_knapsack(A, W, unbounded=True, max_bits=2**25):
+    """
+    Knapsack over (value, weight) items, returns (best value, counts).
+    Unbounded with W up to max_bits: the one-row DP, its time doesn't
+    depend on the values. Otherwise (huge W, or 0/1): branch and bound.
+    """
+    if unbounded and W <= max_bits:
+        return unbounded_knapsack_1d(A, W)
+    return knapsack_branch_bound(A, W, unbounded)
 
+"""
+Time complexity: subset_sum_mitm O(2^(n/2) n). knapsack_branch_bound is
+exponential in the worst case (the bound only cuts branches), but
+usually fast for n around 40, with O(n) per node for the 0/1 bound and
+O(1) for the unbounded one.
+
+Space complexity: O(2^(n/2)) for meet in the middle, O(n^2) for the
+branch and bound stack (at most two entries per item, each holding what
+was taken so far).
+"""
 
+# print(subset_sum_mitm([2,7,1,6,3], 9)) # (9, [6, 3])
+# print(knapsack_branch_bound(arr, 11)) # (40, [0, 2, 0, 0, 1])
+# print(solve_knapsack([(5,3),(4,2)], 10**12 + 1)) # (2000000000001, [1, 499999999999]), huge W
+# print(solve_subset_sum([2**k + 1 for k in range(40)], 10**12)[0]) # 999999999999